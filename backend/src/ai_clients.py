@@ -1,13 +1,19 @@
+import io
 import os
 import json
 import base64
+import asyncio
 import argparse
-import requests
+import tempfile
+import threading
+import importlib.util
+import weakref
 from pathlib import Path
-from typing import Optional, Dict, Any, Type, TypeVar
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, List, Type, TypeVar, Coroutine, Union
 
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
 from pydantic import BaseModel
 from PIL import Image
 
@@ -15,14 +21,22 @@ from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
+from workflow.cache import ResponseCache, content_key
+from workflow.breaker import CircuitBreaker, CircuitOpenError
+from workflow.limiter import AdaptiveLimiter
+from workflow.utils import RecoverableError, retry_policy
+from workflow.metrics import REGISTRY, DOWNLOADED_BYTES, UPLOADED_BYTES, FALLBACKS, track_upstream
+
 # --- Availability Flags ---
 RICH_AVAILABLE = True
 PYDANTIC_AVAILABLE = True
 PIL_AVAILABLE = True
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 # --- Environment Setup ---
 load_dotenv()
 API_KEY = os.getenv("AIMLAPI_KEY")
+BASE_URL = os.getenv("AIML_BASE_URL", "https://api.aimlapi.com/v1").rstrip("/")
 
 # --- Model Configurations ---
 TEXT_MODEL = os.getenv("AIML_TEXT_MODEL", "openai/gpt-5-mini-2025-08-07")
@@ -31,39 +45,321 @@ I2I_MODEL = os.getenv("AIML_I2I_MODEL", "bytedance/seededit-3.0-i2i")
 EDIT_MODEL = os.getenv("AIML_EDIT_MODEL", "openai/gpt-image-1")
 MULTIMODAL_MODEL = os.getenv("AIML_MULTIMODAL_MODEL", "openai/gpt-5-2025-08-07")
 
+# --- Connection Pool Configuration ---
+MAX_CONNECTIONS = int(os.getenv("AIML_MAX_CONNECTIONS", "32"))
+KEEPALIVE_EXPIRY = float(os.getenv("AIML_KEEPALIVE_EXPIRY", "60"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Longest side of reference images sent to the edit model; they only steer style and character.
+EDIT_REFERENCE_SIZE = int(os.getenv("AIML_EDIT_REFERENCE_SIZE", "768"))
+
+# --- Upstream Concurrency Budgets (adaptive; share across workers with AIML_LIMITER_STATE) ---
+UPSTREAM_TEXT_CONCURRENCY = int(os.getenv("AIML_TEXT_CONCURRENCY", "8"))
+UPSTREAM_IMAGE_CONCURRENCY = int(os.getenv("AIML_IMAGE_CONCURRENCY", "4"))
+LIMITER_STATE = os.getenv("AIML_LIMITER_STATE")
+
+# --- Retries and Circuit Breakers (per endpoint) ---
+# endpoint: (budget, retry attempts); override attempts with AIML_RETRY_ATTEMPTS_<ENDPOINT>
+ENDPOINTS = {
+    "/chat/completions": ("text", int(os.getenv("AIML_RETRY_ATTEMPTS_CHAT", "3"))),
+    "/images/generations": ("image", int(os.getenv("AIML_RETRY_ATTEMPTS_IMAGES", "2"))),
+    "/images/edits": ("image", int(os.getenv("AIML_RETRY_ATTEMPTS_EDITS", "2"))),
+}
+RETRY_MAX_WAIT = float(os.getenv("AIML_RETRY_MAX_WAIT", "8"))
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Failures that happen before the upstream starts (or bills) the work. Image
+# endpoints retry only these; a read timeout there usually means the image is
+# still being generated, so a retry would pay for it twice.
+UNSENT_REQUEST_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+BREAKER_THRESHOLD = int(os.getenv("AIML_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("AIML_BREAKER_RESET", "30"))
+
+# --- LLM Response Cache (opt-in: set LLM_CACHE_DIR) ---
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_KEY_FIELDS = ("model", "messages", "seed", "temperature", "response_format", "max_tokens")
+
 # --- Client Initialization ---
-client = None
 console = Console()
-if API_KEY:
-    client = OpenAI(base_url="https://api.aimlapi.com/v1", api_key=API_KEY)
-else:
+if not API_KEY:
     console.print("[yellow]Warning: AIMLAPI_KEY not found. AI functions will be disabled.[/yellow]")
 
+# One pooled keep-alive client per event loop (httpx clients cannot cross loops).
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+text_limiter = AdaptiveLimiter(
+    "text", UPSTREAM_TEXT_CONCURRENCY, latency_target=float(os.getenv("AIML_TEXT_LATENCY_TARGET", "30")),
+    state_path=Path(LIMITER_STATE) if LIMITER_STATE else None,
+)
+image_limiter = AdaptiveLimiter(
+    "image", UPSTREAM_IMAGE_CONCURRENCY, latency_target=float(os.getenv("AIML_IMAGE_LATENCY_TARGET", "60")),
+    state_path=Path(LIMITER_STATE) if LIMITER_STATE else None,
+)
+breakers = {path: CircuitBreaker(path.strip("/"), BREAKER_THRESHOLD, BREAKER_RESET) for path in ENDPOINTS}
+response_cache: Optional[ResponseCache] = (
+    ResponseCache(Path(LLM_CACHE_DIR), LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL) if LLM_CACHE_DIR else None
+)
+
+
+class IncompleteDownloadError(httpx.HTTPError):
+    """Raised when a downloaded image is truncated or cannot be decoded."""
+
+
+@dataclass(frozen=True)
+class ReferenceUpload:
+    """A reference image already downscaled and encoded for the edits endpoint."""
+    filename: str
+    content: bytes
+    content_type: str
+
+
 # --- Typing ---
 PydanticModel = TypeVar("PydanticModel", bound=BaseModel)
+T = TypeVar("T")
 
 # =============================================================================
-# Core Functions
+# Connection Management
 # =============================================================================
 
-def generate_text(system_prompt: str, user_prompt: str) -> Optional[str]:
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared pooled client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    http_client = _async_clients.get(loop)
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(120, connect=10),
+        )
+        _async_clients[loop] = http_client
+    return http_client
+
+
+async def aclose_client() -> None:
+    """Close the pooled client bound to the running event loop (call on shutdown)."""
+    http_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if http_client is not None:
+        await http_client.aclose()
+
+
+def _run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine on the shared background loop and wait for it.
+    Every sync caller, whatever its thread, shares that loop's connection pool.
+    """
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="ai-clients-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+
+def _auth_headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {API_KEY}"}
+
+
+async def _apost_once(path: str, **kwargs) -> httpx.Response:
+    breaker = breakers[path]
+    limiter = text_limiter if ENDPOINTS[path][0] == "text" else image_limiter
+    breaker.before_call()
+    try:
+        async with limiter.slot() as slot:
+            try:
+                response = await get_async_client().post(path, headers=_auth_headers(), **kwargs)
+            except httpx.TimeoutException as e:
+                if not isinstance(e, httpx.PoolTimeout):  # local pool wait, not upstream slowness
+                    slot.observe_timeout()
+                raise
+            slot.observe(response.status_code, response.headers.get("Retry-After"))
+    except httpx.TransportError as e:
+        breaker.record_failure()
+        if ENDPOINTS[path][0] == "text" or isinstance(e, UNSENT_REQUEST_ERRORS):
+            raise RecoverableError(str(e)) from e
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        if response.status_code in RETRYABLE_STATUSES:
+            breaker.record_failure()
+            raise RecoverableError(str(e)) from e
+        breaker.release()  # a client error says nothing about upstream health
+        raise
+    breaker.record_success()
+    return response
+
+
+async def _apost(path: str, **kwargs) -> httpx.Response:
+    """
+    POST to an upstream endpoint within its concurrency budget, retrying transient
+    failures with jittered backoff. Raises CircuitOpenError while the endpoint's
+    breaker is open, and the underlying httpx error once retries run out.
+    """
+    try:
+        return await retry_policy(ENDPOINTS[path][1], RETRY_MAX_WAIT)(_apost_once)(path, **kwargs)
+    except RecoverableError as e:
+        raise e.__cause__
+
+
+def upstream_status() -> Dict[str, Any]:
+    """Breaker state per endpoint and the current adaptive concurrency budgets."""
+    return {
+        "breakers": {path.strip("/"): breaker.snapshot() for path, breaker in breakers.items()},
+        "budgets": {limiter.name: limiter.snapshot() for limiter in (text_limiter, image_limiter)},
+    }
+
+
+def _cacheable(body: Dict[str, Any], validate: Optional[Callable[[str], Any]]) -> bool:
+    """Only complete answers that the caller can use are worth replaying."""
+    try:
+        choice = body["choices"][0]
+        content = choice["message"]["content"]
+        if not content or choice.get("finish_reason") not in (None, "stop"):
+            return False
+        if validate is not None:
+            validate(content)
+    except Exception:
+        return False
+    return True
+
+
+async def _achat(payload: Dict[str, Any], validate: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    """
+    POST a chat completion request and return the decoded JSON body.
+    When the response cache is enabled, identical requests are answered from disk.
+    A response is cached only if it finished normally and its content passes
+    `validate` (e.g. json.loads), so a truncated answer is never replayed.
+    """
+    key = None
+    if response_cache is not None:
+        key = content_key({field: payload.get(field) for field in CACHE_KEY_FIELDS})
+        # Disk I/O off the loop: other upstream calls share it.
+        cached = await asyncio.to_thread(response_cache.get, key)
+        if cached is not None and _cacheable(cached, validate):
+            return cached
+
+    response = await _apost("/chat/completions", json=payload)
+    body = response.json()
+
+    if key is not None and _cacheable(body, validate):
+        await asyncio.to_thread(response_cache.put, key, body)
+    return body
+
+
+def response_cache_stats() -> Optional[Dict[str, Any]]:
+    """Hit/miss/eviction counters for the LLM response cache, or None when disabled."""
+    return response_cache.stats() if response_cache is not None else None
+
+
+def _response_cache_metrics() -> list[str]:
+    stats = response_cache_stats()
+    if not stats:
+        return []
+    lines = []
+    for name in ("hits", "misses", "evictions"):
+        lines += [f"# TYPE kidsbook_llm_cache_{name}_total counter", f"kidsbook_llm_cache_{name}_total {stats[name]}"]
+    return lines
+
+
+REGISTRY.add_collector(_response_cache_metrics)
+
+
+def _verify_image(path: Path) -> None:
+    """Fully decode an image so truncated or corrupt files fail here, not in the PDF build."""
+    with Image.open(path) as img:
+        img.load()
+
+
+async def _adownload_image(image_url: str, output_path: Path) -> Path:
+    """
+    Stream an image to a temp file next to `output_path`, check its length and
+    decodability, then rename it into place. Memory use is one chunk per download.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{output_path.name}.", suffix=".part", dir=output_path.parent)
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with get_async_client().stream("GET", image_url, timeout=60) as image_response:
+                image_response.raise_for_status()
+                # Content-Length counts encoded bytes, so only compare it for identity transfers.
+                encoded = image_response.headers.get("Content-Encoding", "identity") != "identity"
+                expected = None if encoded else image_response.headers.get("Content-Length")
+                received = 0
+                async for chunk in image_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+        if expected is not None and received != int(expected):
+            raise IncompleteDownloadError(f"Expected {expected} bytes from {image_url}, got {received}")
+        try:
+            await asyncio.to_thread(_verify_image, tmp_path)
+        except Exception as e:
+            raise IncompleteDownloadError(f"Downloaded image is not decodable: {e}") from e
+        os.replace(tmp_path, output_path)
+        DOWNLOADED_BYTES.inc(received)
+        return output_path
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def _encode_reference(path: Path, max_side: int) -> ReferenceUpload:
+    with Image.open(path) as img:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        # Keep PNG only when transparency matters; opaque references travel as JPEG.
+        if img.mode in ("RGBA", "LA", "P") and img.convert("RGBA").getchannel("A").getextrema()[0] < 255:
+            fmt, content_type, suffix, img = "PNG", "image/png", ".png", img.convert("RGBA")
+        else:
+            fmt, content_type, suffix, img = "JPEG", "image/jpeg", ".jpg", img.convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, **({"quality": 90} if fmt == "JPEG" else {"optimize": True}))
+    return ReferenceUpload(path.stem + suffix, buf.getvalue(), content_type)
+
+
+def prepare_reference_uploads(image_paths: List[Path], max_side: int = EDIT_REFERENCE_SIZE) -> List[ReferenceUpload]:
+    """
+    Downscale and encode reference images once so every page edit of a book can
+    reuse the same bytes. Missing or unreadable files are skipped with a warning.
+    """
+    uploads = []
+    for path in image_paths:
+        try:
+            uploads.append(_encode_reference(Path(path), max_side))
+        except (OSError, ValueError) as e:
+            console.print(f"[yellow]Warning: Reference image not usable, skipping: {path} ({e})[/yellow]")
+    return uploads
+
+# =============================================================================
+# Core Functions (async)
+# =============================================================================
+
+@track_upstream("generate_text")
+async def agenerate_text(system_prompt: str, user_prompt: str) -> Optional[str]:
     """Generate plain text content from the text model."""
-    if not client:
+    if not API_KEY:
         Console().print("[red]❌ No client available. Did you set AIMLAPI_KEY?[/red]")
         return None
     try:
-        response = client.chat.completions.create(
-            model=TEXT_MODEL,
-            messages=[
+        response = await _achat({
+            "model": TEXT_MODEL,
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            seed=42,
-            temperature=1.0,
-            max_tokens=2000,
-        )
+            "seed": 42,
+            "temperature": 1.0,
+            "max_tokens": 2000,
+        })
 
-        content = response.choices[0].message.content
+        content = response["choices"][0]["message"]["content"]
         if not content:
             Console().print("[red]❌ Empty content returned by API[/red]")
             Console().print(response)
@@ -79,41 +375,40 @@ def generate_text(system_prompt: str, user_prompt: str) -> Optional[str]:
         return None
 
 
-
-def generate_json(system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+@track_upstream("generate_json")
+async def agenerate_json(system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
     """Generate structured text content as JSON using the text model."""
-    if not client:
+    if not API_KEY:
         return None
     try:
-        response = client.chat.completions.create(
-            model=TEXT_MODEL,
-            messages=[
+        response = await _achat({
+            "model": TEXT_MODEL,
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            seed=42,
-            temperature=1,
-            max_tokens=2000,
-            response_format={"type": "json_object"},
-        )
-        return json.loads(response.choices[0].message.content)
+            "seed": 42,
+            "temperature": 1,
+            "max_tokens": 2000,
+            "response_format": {"type": "json_object"},
+        }, validate=json.loads)
+        return json.loads(response["choices"][0]["message"]["content"])
     except Exception as e:
         console.print(f"[red]Error in generate_json: {e}[/red]")
         return None
 
 
-def generate_image_from_text(prompt: str, output_path: Path) -> Optional[Path]:
+@track_upstream("generate_image_from_text")
+async def agenerate_image_from_text(prompt: str, output_path: Path) -> Optional[Path]:
     """Generate an image from a text prompt and save to file."""
     if not API_KEY:
         return None
     try:
-        api_response = requests.post(
-            "https://api.aimlapi.com/v1/images/generations",
-            headers={"Authorization": f"Bearer {API_KEY}"},
+        api_response = await _apost(
+            "/images/generations",
             json={"prompt": prompt, "model": IMAGE_MODEL},
             timeout=90,
         )
-        api_response.raise_for_status()
         data = api_response.json()
 
         image_url = _extract_image_url_from_response(data)
@@ -121,79 +416,49 @@ def generate_image_from_text(prompt: str, output_path: Path) -> Optional[Path]:
             console.print(f"[red]No image URL in API response. Response: {data}[/red]")
             return None
 
-        image_response = requests.get(image_url, timeout=60)
-        image_response.raise_for_status()
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(image_response.content)
-        return output_path
-    except requests.exceptions.RequestException as e:
+        return await _adownload_image(image_url, output_path)
+    except (httpx.HTTPError, CircuitOpenError, ValueError, OSError) as e:
+        # ValueError: a 200 with a non-JSON body (e.g. a gateway error page).
         console.print(f"[red]Image generation error: {e}[/red]")
         return None
 
 
-# def generate_image_from_image(prompt: str, base_image_path: Path, output_path: Path) -> Optional[Path]:
-#     """Modify an existing image using a text prompt (Image-to-Image)."""
-#     if not client:
-#         return None
-#     try:
-#         with open(base_image_path, "rb") as image_file:
-#             response = client.images.edit(
-#                 model=EDIT_MODEL,
-#                 image=image_file,
-#                 prompt=prompt,
-#             )
-
-#         modified_image_url = response.data[0].url
-#         if not modified_image_url:
-#             console.print("[red]I2I Error: No URL in Edit API response.[/red]")
-#             return None
-
-#         image_response = requests.get(modified_image_url, timeout=60)
-#         image_response.raise_for_status()
-#         output_path.parent.mkdir(parents=True, exist_ok=True)
-#         with open(output_path, "wb") as f:
-#             f.write(image_response.content)
-#         return output_path
-#     except Exception as e:
-#         console.print(f"[red]Error in generate_image_from_image: {e}[/red]")
-#         return None
-
-
-def generate_structured_text(system_prompt: str, user_prompt: str, pydantic_model: Type[PydanticModel]) -> Optional[PydanticModel]:
+@track_upstream("generate_structured_text")
+async def agenerate_structured_text(system_prompt: str, user_prompt: str, pydantic_model: Type[PydanticModel]) -> Optional[PydanticModel]:
     """Generate structured JSON output validated against a Pydantic model."""
-    if not client or not PYDANTIC_AVAILABLE:
+    if not API_KEY or not PYDANTIC_AVAILABLE:
         return None
+    if hasattr(pydantic_model, "model_validate_json"):  # Pydantic v2
+        parse = pydantic_model.model_validate_json
+    else:
+        parse = pydantic_model.parse_raw  # Pydantic v1 fallback
     try:
-        response = client.chat.completions.create(
-            model=MULTIMODAL_MODEL,
-            messages=[
+        response = await _achat({
+            "model": MULTIMODAL_MODEL,
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
-            response_format={
+            "response_format": {
                 "type": "json_schema",
                 "json_schema": {
                     "name": pydantic_model.__name__,
                     "schema": pydantic_model.model_json_schema(),
                 },
             },
-            temperature=0.7,
-            max_tokens=4000,
-        )
-        content = response.choices[0].message.content
-
-        if hasattr(pydantic_model, "model_validate_json"):  # Pydantic v2
-            return pydantic_model.model_validate_json(content)
-        return pydantic_model.parse_raw(content)  # Pydantic v1 fallback
+            "temperature": 0.7,
+            "max_tokens": 4000,
+        }, validate=parse)
+        return parse(response["choices"][0]["message"]["content"])
     except Exception as e:
         console.print(f"[red]Error in generate_structured_text: {e}[/red]")
         return None
 
 
-def generate_response_from_image_and_text(prompt: str, image_path: Path) -> Optional[str]:
+@track_upstream("generate_response_from_image_and_text")
+async def agenerate_response_from_image_and_text(prompt: str, image_path: Path) -> Optional[str]:
     """Generate a text response from a prompt and an input image (multimodal)."""
-    if not client:
+    if not API_KEY:
         return None
 
     image_uri = _get_image_data_uri(image_path)
@@ -201,87 +466,112 @@ def generate_response_from_image_and_text(prompt: str, image_path: Path) -> Opti
         return None
 
     try:
-        response = client.chat.completions.create(
-            model=MULTIMODAL_MODEL,
-            messages=[{
+        response = await _achat({
+            "model": MULTIMODAL_MODEL,
+            "messages": [{
                 "role": "user",
                 "content": [
                     {"type": "text", "text": prompt},
                     {"type": "image_url", "image_url": {"url": image_uri}},
                 ],
             }],
-            max_tokens=1024,
-        )
-        return response.choices[0].message.content
+            "max_tokens": 1024,
+        })
+        return response["choices"][0]["message"]["content"]
     except Exception as e:
         console.print(f"[red]Error in generate_response_from_image_and_text: {e}[/red]")
         return None
 
-def generate_image_from_images(prompt: str, image_paths: list[Path], output_path: Path) -> Optional[Path]:
-    """Modify one or multiple images using a text prompt by manually building a multipart request."""
-    if not API_KEY:
-        return None
 
-    files_to_upload = []
-    
-    try:
-        # Prepare the multipart/form-data payload
-        # The API expects the prompt and model as form fields, and images as file parts.
-        data = {"prompt": prompt, "model": EDIT_MODEL}
-        
-        # Flatten list and prepare files for upload
-        flat_paths = [p for sublist in image_paths if isinstance(sublist, list) for p in sublist] + \
-                     [p for p in image_paths if not isinstance(p, list)]
-
-        for i, path in enumerate(flat_paths):
-            if path.exists():
-                # Each file is a tuple: (form_field_name, (filename, file_object, content_type))
-                files_to_upload.append(
-                    ('image', (path.name, open(path, 'rb'), 'image/png'))
-                )
-            else:
-                console.print(f"[yellow]Warning: Reference image not found, skipping: {path}[/yellow]")
-        
-        if not files_to_upload:
-            raise ValueError("No valid image files were provided for editing.")
-
-        # Make the request to the edits endpoint
-        api_response = requests.post(
-            "https://api.aimlapi.com/v1/images/edits",
-            headers={"Authorization": f"Bearer {API_KEY}"},
-            data=data,
-            files=files_to_upload,
-            timeout=120,
-        )
-        api_response.raise_for_status()
-        response_data = api_response.json()
+@track_upstream("generate_image_from_images")
+async def _aedit_images(prompt: str, images: List[Union[Path, ReferenceUpload]], output_path: Path) -> Optional[Path]:
+    # Prepare the multipart/form-data payload
+    # The API expects the prompt and model as form fields, and images as file parts.
+    data = {"prompt": prompt, "model": EDIT_MODEL}
+
+    # Flatten list; plain paths are encoded here, prepared uploads are sent as-is
+    flat = [p for sublist in images if isinstance(sublist, list) for p in sublist] + \
+           [p for p in images if not isinstance(p, list)]
+    uploads = [p for p in flat if isinstance(p, ReferenceUpload)]
+    paths = [p for p in flat if not isinstance(p, ReferenceUpload)]
+    if paths:
+        uploads += await asyncio.to_thread(prepare_reference_uploads, paths)
+
+    if not uploads:
+        raise ValueError("No valid image files were provided for editing.")
+
+    # Each file is a tuple: (form_field_name, (filename, content, content_type))
+    files_to_upload = [("image", (u.filename, u.content, u.content_type)) for u in uploads]
+    UPLOADED_BYTES.inc(sum(len(u.content) for u in uploads))
+
+    # Make the request to the edits endpoint
+    api_response = await _apost(
+        "/images/edits",
+        data=data,
+        files=files_to_upload,
+        timeout=120,
+    )
+    response_data = api_response.json()
 
-        modified_image_url = _extract_image_url_from_response(response_data)
-        if not modified_image_url:
-            console.print(f"[red]I2I Error: No URL in Edit API response. Response: {response_data}[/red]")
-            return None
+    modified_image_url = _extract_image_url_from_response(response_data)
+    if not modified_image_url:
+        console.print(f"[red]I2I Error: No URL in Edit API response. Response: {response_data}[/red]")
+        return None
 
-        image_response = requests.get(modified_image_url, timeout=60)
-        image_response.raise_for_status()
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "wb") as f:
-            f.write(image_response.content)
+    return await _adownload_image(modified_image_url, output_path)
 
-        return output_path
 
+async def agenerate_image_from_images(prompt: str, image_paths: List[Union[Path, ReferenceUpload]],
+                                      output_path: Path) -> Optional[Path]:
+    """
+    Modify one or multiple images using a text prompt by manually building a multipart request.
+    Pass ReferenceUploads from prepare_reference_uploads() to avoid re-encoding per call.
+    """
+    if not API_KEY:
+        return None
+
+    try:
+        return await _aedit_images(prompt, image_paths, output_path)
     except Exception as e:
         console.print(f"[red]Error in generate_image_from_images: {e}[/red]")
         # Create a fallback placeholder image on error
+        FALLBACKS.inc(kind="edit_placeholder")
         Image.new("RGB", (1024, 1024), (240, 240, 240)).save(output_path)
         return output_path
 
-    finally:
-        # Ensure all opened file objects are closed
-        for _, (_, file_obj, _) in files_to_upload:
-            try:
-                file_obj.close()
-            except Exception:
-                pass
+# =============================================================================
+# Core Functions (sync wrappers for the CLI and worker threads)
+# =============================================================================
+
+def generate_text(system_prompt: str, user_prompt: str) -> Optional[str]:
+    """Generate plain text content from the text model."""
+    return _run_sync(agenerate_text(system_prompt, user_prompt))
+
+
+def generate_json(system_prompt: str, user_prompt: str) -> Optional[Dict[str, Any]]:
+    """Generate structured text content as JSON using the text model."""
+    return _run_sync(agenerate_json(system_prompt, user_prompt))
+
+
+def generate_image_from_text(prompt: str, output_path: Path) -> Optional[Path]:
+    """Generate an image from a text prompt and save to file."""
+    return _run_sync(agenerate_image_from_text(prompt, output_path))
+
+
+def generate_structured_text(system_prompt: str, user_prompt: str, pydantic_model: Type[PydanticModel]) -> Optional[PydanticModel]:
+    """Generate structured JSON output validated against a Pydantic model."""
+    return _run_sync(agenerate_structured_text(system_prompt, user_prompt, pydantic_model))
+
+
+def generate_response_from_image_and_text(prompt: str, image_path: Path) -> Optional[str]:
+    """Generate a text response from a prompt and an input image (multimodal)."""
+    return _run_sync(agenerate_response_from_image_and_text(prompt, image_path))
+
+
+def generate_image_from_images(prompt: str, image_paths: List[Union[Path, ReferenceUpload]],
+                               output_path: Path) -> Optional[Path]:
+    """Modify one or multiple images using a text prompt."""
+    return _run_sync(agenerate_image_from_images(prompt, image_paths, output_path))
 
 
 def generate_image_from_image(prompt: str, base_image_path: Path, output_path: Path) -> Optional[Path]:
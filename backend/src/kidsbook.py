@@ -1,32 +1,45 @@
 import argparse
+import functools
+import json
 import os
 from pathlib import Path
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.table import Table
 
 from workflow.user_input import UserConfig, validate_user_config, PAINTINGS
-from workflow.art_features import extract_art_features
-from workflow.story import create_outline, write_full_story
-from workflow.images import prompts_for_chapters, render_images
+from workflow.art_features import warm_art_features
 from workflow.layout import build_kids_pdf
-from workflow.references import generate_reference_images
+from workflow.pipeline import run_book
 from ai_clients import load_fallback_json
 from workflow.memory import MemoryStore
+from workflow.batch import BATCH_WORKERS, Checkpoint, load_batch, run_batch
 
 # ------------------- Paths -------------------
-MEMORY_PATH = Path("output/memory.json")
-memory = MemoryStore(MEMORY_PATH)
+MEMORY_PATH = Path("output/memory.db")  # imports a legacy output/memory.json once
 OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "output"))
 FALLBACK_JSON = Path("fallback/fallback_data.json")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 console = Console()
 
 
 # ------------------- Full Run -------------------
+STAGE_LABELS = {
+    "art_features": "Extracting art features…",
+    "outline": "Creating outline…",
+    "story": "Writing chapters…",
+    "references": "Generating reference images…",
+    "prompts": "Planning page illustrations…",
+    "layout": "Starting PDF layout…",
+    "text_pages": "Laying out text pages…",
+    "images": "Generating chapter images…",
+    "pdf": "Composing PDF…",
+}
+
+
 def run_full(cfg: UserConfig):
     validate_user_config(cfg)
-    painting_name = PAINTINGS[cfg.painting_id]
+    pdf_path = OUTPUT_DIR / f"book_{cfg.child_name}.pdf"
 
     with Progress(
         SpinnerColumn(),
@@ -34,62 +47,77 @@ def run_full(cfg: UserConfig):
         console=console,
         transient=False,
     ) as progress:
-        # --- Step 1: Art features ---
-        t1 = progress.add_task("Extracting art features…", total=1)
-        art = extract_art_features(painting_name)
-        progress.update(t1, completed=1)
-        progress.stop_task(t1)
-
-        # --- Step 2: Create outline ---
-        t2 = progress.add_task("Creating outline…", total=1)
-        outline = create_outline(cfg.child_name, cfg.child_age, cfg.family_value, painting_name)
-        progress.update(t2, completed=1)
-        progress.stop_task(t2)
-
-        # --- Step 3: Write chapters ---
-        t3 = progress.add_task("Writing chapters…", total=1)
-        chapters = write_full_story(outline, cfg.child_age, art) 
-        progress.update(t3, completed=1)
-        progress.stop_task(t3)
-
-        # --- Step 4: Generate reference images ---
-        t4 = progress.add_task("Generating reference images…", total=1)
-        refs_dir = OUTPUT_DIR / "references" / cfg.child_name.lower()
-        refs = generate_reference_images(cfg.child_name, art, refs_dir)
-        progress.update(t4, completed=1)
-        progress.stop_task(t4)
-
-        # --- Step 5: Generate chapter images ---
-        t5 = progress.add_task("Generating chapter images…", total=1)
-        prompts = prompts_for_chapters(cfg.child_name, art, outline)
-        img_dir = OUTPUT_DIR / "images" / cfg.child_name.lower()
-
-        # Pass references to render_images
-        images = render_images(prompts, img_dir, refs=refs)
-        progress.update(t5, completed=1)
-        progress.stop_task(t5)
-
-        # --- Step 6: Compose PDF ---
-        t6 = progress.add_task("Composing PDF…", total=1)
-        pdf_path = OUTPUT_DIR / f"book_{cfg.child_name}.pdf"
-            # !!! UTILISE LE TITRE DE L'OUTLINE ICI !!!
-        book_title = outline.get("book_title", f"{cfg.child_name}'s Amazing Story")
-        build_kids_pdf(book_title, chapters, images, pdf_path)
-        progress.update(t6, completed=1)
-        progress.stop_task(t6)
+        # Independent stages (e.g. story and reference images) run side by side.
+        tasks = {}
+
+        def on_event(stage: str, status: str, info: dict):
+            if status == "started":
+                tasks[stage] = progress.add_task(STAGE_LABELS.get(stage, stage), total=1)
+            else:
+                progress.update(tasks[stage], completed=1)
+                progress.stop_task(tasks[stage])
+
+        result = run_book(
+            cfg,
+            refs_dir=OUTPUT_DIR / "references" / cfg.child_name.lower(),
+            images_dir=OUTPUT_DIR / "images" / cfg.child_name.lower(),
+            pdf_path=pdf_path,
+            on_event=on_event,
+        )
 
     console.print(f"[bold green]Done.[/bold green] PDF: {pdf_path}")
+    save_session(cfg, result, pdf_path)
+    return pdf_path
+
+
+@functools.lru_cache(maxsize=None)
+def get_memory() -> MemoryStore:
+    """Session store, opened (and created) on first use rather than at import."""
+    return MemoryStore(MEMORY_PATH)
 
-    # Save session
-    memory.put_session({
+
+def save_session(cfg: UserConfig, result: dict, pdf_path: Path):
+    get_memory().put_session({
         "child_name": cfg.child_name,
-        "painting": painting_name,
-        "outline": outline,
-        "chapters": chapters,
-        "images": [str(p) for p in images],
+        "painting": PAINTINGS[cfg.painting_id],
+        "outline": result["outline"],
+        "chapters": result["chapters"],
+        "images": [str(p) for p in result["images"]],
         "pdf": str(pdf_path)
     })
-    return pdf_path
+
+
+# ------------------- Batch Run -------------------
+def run_batch_file(batch_path: Path, workers: int = BATCH_WORKERS):
+    configs = load_batch(batch_path)
+    checkpoint = Checkpoint(batch_path.with_name(batch_path.stem + ".checkpoint.jsonl"))
+    report_path = batch_path.with_name(batch_path.stem + ".report.json")
+    console.print(f"📚 {len(configs)} book(s) in {batch_path}, {len(checkpoint.done)} already done.")
+
+    def on_progress(entry: dict):
+        mark = "✅" if entry["status"] == "ok" else "❌"
+        console.print(f"{mark} {entry['child_name']} ({entry['painting_id']}) in {entry['seconds']:.1f}s")
+
+    report = run_batch(configs, OUTPUT_DIR, checkpoint, workers=workers,
+                       on_book=save_session, on_progress=on_progress)
+    report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    table = Table(title="Batch summary")
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    latency = report["latency_seconds"] or {}
+    for label, value in (
+        ("Books built", report["succeeded"]),
+        ("Failed", len(report["failed"])),
+        ("Skipped (checkpoint)", report["skipped"]),
+        ("Wall time (s)", report["wall_seconds"]),
+        ("Books / hour", report["books_per_hour"]),
+        ("Latency p50 / p90 (s)", f"{latency.get('p50', '-')} / {latency.get('p90', '-')}"),
+    ):
+        table.add_row(label, str(value))
+    console.print(table)
+    console.print(f"Report: {report_path}")
+    return report
 
 
 # ------------------- Fallback Run -------------------
@@ -111,9 +139,24 @@ if __name__ == "__main__":
     parser.add_argument("--age", type=int, default=6)
     parser.add_argument("--value", default="sharing")
     parser.add_argument("--fallback", action="store_true", help="Use pre-generated fallback JSON + images.")
+    parser.add_argument("--warm-cache", action="store_true", help="Precompute art features for every catalog painting.")
+    parser.add_argument("--batch", type=Path, metavar="FILE",
+                        help="Build every book listed in a .jsonl or .csv file (painting_id, child_name, "
+                             "child_age, family_value). Re-running resumes from the checkpoint.")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Books built in parallel with --batch.")
+    parser.add_argument("--compact-memory", type=float, metavar="DAYS",
+                        help="Drop sessions older than DAYS from the history store and reclaim space.")
     args = parser.parse_args()
 
-    if args.fallback:
+    if args.warm_cache:
+        for painting_id, cached in warm_art_features().items():
+            console.print(f"{'✅' if cached else '❌'} {painting_id}")
+    elif args.batch:
+        run_batch_file(args.batch, workers=args.workers)
+    elif args.compact_memory is not None:
+        removed = get_memory().compact(max_age=args.compact_memory * 24 * 3600)
+        console.print(f"Removed {removed} session(s) from {MEMORY_PATH}")
+    elif args.fallback:
         run_fallback()
     else:
         cfg = UserConfig(args.painting, args.name, args.age, args.value)
@@ -0,0 +1,219 @@
+import io
+import os
+import json
+import random
+import asyncio
+import argparse
+import itertools
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import sys
+
+# Add parent (src/) to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from PIL import Image
+
+from workflow.cache import content_key, atomic_write_bytes
+# The fields ai_clients keys its response cache on, so recordings line up with cache keys.
+from ai_clients import CACHE_KEY_FIELDS as CHAT_KEY_FIELDS
+
+# One JSON object that satisfies every JSON prompt in the pipeline
+# (art features, outline and full story), used when nothing was recorded.
+CANNED_JSON = {
+    "colors": ["deep blue", "golden yellow", "soft white"],
+    "mood": "dreamy",
+    "style": "post-impressionism",
+    "brushwork": "swirling, expressive",
+    "hero_prompt": "A cheerful child in a colorful outfit",
+    "prop_prompts": ["a glowing lantern", "a paintbrush"],
+    "background_prompt": "A starry village at night",
+    "hero": {"name": "Hero", "traits": ["curious", "kind"]},
+    "book_title": "The Night the Stars Shared",
+    "chapters": [
+        {"title": f"Chapter {i}", "summary": f"The hero shares a little star, part {i}.",
+         "text": f"The hero found a tiny star and decided to share its light, part {i}."}
+        for i in range(1, 4)
+    ],
+}
+CANNED_TEXT = "Once upon a time, a curious child shared the brightest star with everyone."
+
+
+@dataclass
+class Latency:
+    """A latency distribution in seconds: fixed, uniform, normal or lognormal."""
+    kind: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, raw = spec.partition(":")
+        return cls(kind, tuple(float(x) for x in raw.split(",") if x))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(*self.params)
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+
+@dataclass
+class StubConfig:
+    recordings: Path = Path("recordings")
+    latency: Dict[str, Latency] = field(default_factory=dict)  # keys: chat, image, file
+    time_scale: float = 1.0
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [429, 500, 503])
+    retry_after: Optional[int] = 1
+    record_from: Optional[str] = None  # real upstream base URL when recording
+    api_key: Optional[str] = None
+    seed: Optional[int] = None
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    """Build the stand-in upstream. Routes mirror the AIML API under /v1."""
+    app = FastAPI(title="AIML upstream stub")
+    rng = random.Random(config.seed)
+    chat_dir = config.recordings / "chat"
+    image_dir = config.recordings / "images"
+    image_dir.mkdir(parents=True, exist_ok=True)
+    if not any(image_dir.glob("*.png")):
+        buf = io.BytesIO()
+        Image.new("RGB", (1024, 1024), (120, 150, 210)).save(buf, format="PNG")
+        atomic_write_bytes(image_dir / "default.png", buf.getvalue())
+    rotation = itertools.cycle(sorted(p.name for p in image_dir.glob("*.png")))
+
+    async def simulate(kind: str):
+        latency = config.latency.get(kind)
+        if latency:
+            await asyncio.sleep(latency.sample(rng) * config.time_scale)
+        if kind != "file" and config.error_rate and rng.random() < config.error_rate:
+            status = rng.choice(config.error_statuses)
+            headers = {"Retry-After": str(config.retry_after)} if status == 429 and config.retry_after else {}
+            raise HTTPException(status_code=status, detail="Injected upstream error", headers=headers)
+
+    async def forward(method: str, path: str, **kwargs) -> httpx.Response:
+        async with httpx.AsyncClient(base_url=config.record_from, timeout=180) as upstream:
+            response = await upstream.request(
+                method, path, headers={"Authorization": f"Bearer {config.api_key}"}, **kwargs)
+            response.raise_for_status()
+            return response
+
+    async def image_result(request: Request, key: str, upstream_json: Optional[dict]) -> dict:
+        name = f"{key}.png"
+        if upstream_json is not None:
+            image_list = upstream_json.get("images") or upstream_json.get("data") or []
+            async with httpx.AsyncClient(timeout=60) as downloader:
+                image = await downloader.get(image_list[0]["url"])
+            atomic_write_bytes(image_dir / name, image.content)
+        elif not (image_dir / name).exists():
+            name = next(rotation)
+        return {"data": [{"url": str(request.url_for("file", name=name))}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        payload = await request.json()
+        await simulate("chat")
+        path = chat_dir / f"{content_key({f: payload.get(f) for f in CHAT_KEY_FIELDS})}.json"
+        if config.record_from:
+            body = (await forward("POST", "/chat/completions", json=payload)).json()
+            atomic_write_bytes(path, json.dumps(body, indent=2).encode("utf-8"))
+            return body
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+        response_format = (payload.get("response_format") or {}).get("type")
+        content = json.dumps(CANNED_JSON) if response_format in ("json_object", "json_schema") else CANNED_TEXT
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+    @app.post("/v1/images/generations")
+    async def generations(request: Request):
+        payload = await request.json()
+        await simulate("image")
+        key = content_key("generations", payload.get("model"), payload.get("prompt"))
+        upstream_json = (await forward("POST", "/images/generations", json=payload)).json() \
+            if config.record_from else None
+        return await image_result(request, key, upstream_json)
+
+    @app.post("/v1/images/edits")
+    async def edits(request: Request):
+        form = await request.form()
+        await simulate("image")
+        key = content_key("edits", form.get("model"), form.get("prompt"))
+        upstream_json = None
+        if config.record_from:
+            files = [("image", (f.filename, await f.read(), f.content_type)) for f in form.getlist("image")]
+            data = {"prompt": form.get("prompt"), "model": form.get("model")}
+            upstream_json = (await forward("POST", "/images/edits", data=data, files=files)).json()
+        return await image_result(request, key, upstream_json)
+
+    @app.get("/files/{name}", name="file")
+    async def file(name: str):
+        path = image_dir / Path(name).name
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="Unknown image")
+        await simulate("file")
+        return Response(path.read_bytes(), media_type="image/png")
+
+    @app.exception_handler(httpx.HTTPStatusError)
+    async def upstream_error(request: Request, exc: httpx.HTTPStatusError):
+        return JSONResponse({"detail": exc.response.text}, status_code=exc.response.status_code)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(
+        description="Stand-in AIML upstream for offline benchmarks. Point the app at it with "
+                    "AIML_BASE_URL=http://127.0.0.1:9100/v1 (any AIMLAPI_KEY value works).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--recordings", type=Path, default=Path("recordings"))
+    parser.add_argument("--latency", action="append", default=[], metavar="KIND=DIST",
+                        help="e.g. chat=lognormal:1.5,0.4  image=uniform:20,45  file=fixed:0.2")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every sampled latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of chat/image calls that fail.")
+    parser.add_argument("--error-status", default="429,500,503", help="Comma-separated statuses to inject.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s.")
+    parser.add_argument("--record", metavar="UPSTREAM_URL",
+                        help="Proxy to the real upstream (e.g. https://api.aimlapi.com/v1) and record responses.")
+    parser.add_argument("--seed", type=int, help="Seed for latency and error sampling.")
+    args = parser.parse_args()
+
+    latency = {}
+    for spec in args.latency:
+        kind, _, dist = spec.partition("=")
+        latency[kind] = Latency.parse(dist)
+
+    api_key = None
+    if args.record:
+        from dotenv import load_dotenv
+        load_dotenv()
+        api_key = os.getenv("AIMLAPI_KEY")
+
+    config = StubConfig(
+        recordings=args.recordings,
+        latency=latency,
+        time_scale=args.time_scale,
+        error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_status.split(",")],
+        retry_after=args.retry_after,
+        record_from=args.record,
+        api_key=api_key,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,3 +17,215 @@ def test_generate_image_smoke(tmp_path: Path):
     img_path = tmp_path / "smoke.png"
     path = generate_image_from_text("A tiny blue square sticker", img_path)
     assert path is None or path.exists()
+
+def test_sync_wrappers_share_async_layer(monkeypatch):
+    import httpx
+    import ai_clients
+
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.path)
+        return httpx.Response(200, json={"choices": [{"message": {"content": ' {"ok": true} '}}]})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+
+    assert ai_clients.generate_text("sys", "user") == '{"ok": true}'
+    assert ai_clients.generate_json("sys", "user") == {"ok": True}
+    assert seen == ["/v1/chat/completions", "/v1/chat/completions"]
+
+
+def test_image_download_rejects_truncated_file(tmp_path: Path, monkeypatch):
+    import io
+    import asyncio
+    import httpx
+    import pytest
+    import ai_clients
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (1, 2, 3)).save(buf, format="PNG")
+    png = buf.getvalue()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = png if request.url.path == "/good.png" else png[: len(png) // 2]
+        return httpx.Response(200, content=body)
+
+    monkeypatch.setattr(
+        ai_clients, "get_async_client",
+        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+    good = asyncio.run(ai_clients._adownload_image("https://cdn.test/good.png", tmp_path / "good.png"))
+    assert good.read_bytes() == png
+
+    with pytest.raises(ai_clients.IncompleteDownloadError):
+        asyncio.run(ai_clients._adownload_image("https://cdn.test/bad.png", tmp_path / "bad.png"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["good.png"]
+
+
+def test_response_cache_serves_repeat_prompts(tmp_path: Path, monkeypatch):
+    import httpx
+    import ai_clients
+    from workflow.cache import ResponseCache
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hello"}}]})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    cache = ResponseCache(tmp_path, max_bytes=1024 * 1024, ttl=60)
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+    monkeypatch.setattr(ai_clients, "response_cache", cache)
+
+    assert ai_clients.generate_text("sys", "same prompt") == "hello"
+    assert ai_clients.generate_text("sys", "same prompt") == "hello"
+    assert ai_clients.generate_text("sys", "other prompt") == "hello"
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_response_cache_skips_truncated_or_invalid_answers(tmp_path: Path, monkeypatch):
+    import httpx
+    import ai_clients
+    from workflow.cache import ResponseCache
+
+    answers = [
+        {"content": '{"title": "Half', "finish_reason": "length"},
+        {"content": "not json", "finish_reason": "stop"},
+        {"content": '{"title": "Whole"}', "finish_reason": "stop"},
+    ]
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        answer = answers[min(len(calls), len(answers)) - 1]
+        return httpx.Response(200, json={"choices": [{"message": {"content": answer["content"]},
+                                                      "finish_reason": answer["finish_reason"]}]})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+    monkeypatch.setattr(ai_clients, "response_cache", ResponseCache(tmp_path, max_bytes=1024 * 1024, ttl=60))
+
+    assert ai_clients.generate_json("sys", "outline") is None  # truncated
+    assert ai_clients.generate_json("sys", "outline") is None  # complete but not JSON
+    assert ai_clients.generate_json("sys", "outline") == {"title": "Whole"}
+    assert ai_clients.generate_json("sys", "outline") == {"title": "Whole"}
+    assert len(calls) == 3
+
+
+def test_transient_errors_are_retried_then_breaker_fails_fast(monkeypatch):
+    import httpx
+    import ai_clients
+    from workflow.breaker import CircuitBreaker
+
+    statuses = [503, 200] + [500] * 10
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        status = statuses[len(calls) - 1]
+        return httpx.Response(status, json={"choices": [{"message": {"content": "hello"}}]})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+    monkeypatch.setattr(ai_clients, "RETRY_MAX_WAIT", 0)
+    monkeypatch.setitem(ai_clients.breakers, "/chat/completions",
+                        CircuitBreaker("chat/completions", failure_threshold=3, reset_timeout=60))
+
+    assert ai_clients.generate_text("sys", "user") == "hello"  # 503, then retried
+    assert len(calls) == 2
+
+    assert ai_clients.generate_text("sys", "user") is None  # 3 attempts, all 500
+    assert ai_clients.upstream_status()["breakers"]["chat/completions"]["state"] == "open"
+    assert ai_clients.generate_text("sys", "user") is None  # fails fast, no request sent
+    assert len(calls) == 5
+
+
+def test_image_read_timeouts_are_not_retried_but_connect_errors_are(monkeypatch):
+    import asyncio
+    import httpx
+    import pytest
+    import ai_clients
+    from workflow.breaker import CircuitBreaker
+    from workflow.limiter import AdaptiveLimiter
+
+    errors = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if errors:
+            raise errors.pop(0)
+        return httpx.Response(200, json={"data": []})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    limiter = AdaptiveLimiter("images", max_limit=4, cooldown=0)
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+    monkeypatch.setattr(ai_clients, "image_limiter", limiter)
+    monkeypatch.setattr(ai_clients, "RETRY_MAX_WAIT", 0)
+    monkeypatch.setitem(ai_clients.breakers, "/images/generations",
+                        CircuitBreaker("images/generations", failure_threshold=5, reset_timeout=60))
+
+    errors[:] = [httpx.ConnectError("refused")]
+    assert asyncio.run(ai_clients._apost("/images/generations", json={})).status_code == 200
+
+    errors[:] = [httpx.ReadTimeout("still rendering"), httpx.ConnectError("unused")]
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(ai_clients._apost("/images/generations", json={}))
+    assert len(errors) == 1  # no second, billable attempt
+    assert limiter.snapshot()["limit"] < 4
+
+
+def test_image_generation_returns_none_on_non_json_success(tmp_path: Path, monkeypatch):
+    import httpx
+    import ai_clients
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text="<html>502 Bad Gateway</html>", headers={"Content-Type": "text/html"})
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+
+    assert ai_clients.generate_image_from_text("a cat", tmp_path / "cat.png") is None
+
+
+def test_reference_uploads_are_prepared_once_and_reused(tmp_path: Path, monkeypatch):
+    import io
+    import httpx
+    import ai_clients
+    from PIL import Image
+
+    hero = tmp_path / "hero.png"
+    Image.new("RGB", (1024, 1024), (10, 20, 30)).save(hero)
+    cutout = tmp_path / "props.png"
+    Image.new("RGBA", (1024, 1024), (0, 0, 0, 0)).save(cutout)
+
+    uploads = ai_clients.prepare_reference_uploads([hero, cutout, tmp_path / "missing.png"], max_side=512)
+    assert [u.content_type for u in uploads] == ["image/jpeg", "image/png"]
+    assert Image.open(io.BytesIO(uploads[0].content)).size == (512, 512)
+    assert len(uploads[0].content) < hero.stat().st_size
+
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32)).save(buf, format="PNG")
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/images/edits"):
+            bodies.append(request.read())
+            return httpx.Response(200, json={"data": [{"url": "https://cdn.test/page.png"}]})
+        return httpx.Response(200, content=buf.getvalue())
+
+    mock_client = httpx.AsyncClient(base_url="https://upstream.test/v1", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai_clients, "API_KEY", "test-key")
+    monkeypatch.setattr(ai_clients, "get_async_client", lambda: mock_client)
+
+    for n in range(2):
+        assert ai_clients.generate_image_from_images("page", uploads, tmp_path / f"p{n}.png") == tmp_path / f"p{n}.png"
+    assert all(uploads[0].content in body and b"image/jpeg" in body for body in bodies)
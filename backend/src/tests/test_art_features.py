@@ -0,0 +1,37 @@
+from pathlib import Path
+import workflow.art_features as af
+
+
+def test_art_features_cached_per_painting(tmp_path: Path, monkeypatch):
+    calls = []
+
+    def fake_llm(painting_name):
+        calls.append(painting_name)
+        return af.normalize_features({"colors": ["blue"], "mood": "Calm", "style": "x", "brushwork": "y"})
+
+    monkeypatch.setattr(af, "ART_FEATURES_CACHE", tmp_path / "art_features.json")
+    monkeypatch.setattr(af, "_memo", {})
+    monkeypatch.setattr(af, "_features_from_llm", fake_llm)
+    monkeypatch.setattr(af, "_attach_reference_images", lambda art: art)
+
+    first = af.get_art_features("starry_night")
+    second = af.get_art_features("starry_night")
+    assert len(calls) == 1
+    assert first == second and first is not second
+    assert first.mood == "calm"
+
+    # A fresh process reads the persisted file instead of calling the LLM.
+    monkeypatch.setattr(af, "_memo", {})
+    assert af.get_art_features("starry_night").colors == ["blue"]
+    assert len(calls) == 1
+
+
+def test_fallback_features_are_not_cached(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(af, "ART_FEATURES_CACHE", tmp_path / "art_features.json")
+    monkeypatch.setattr(af, "_memo", {})
+    monkeypatch.setattr(af, "_features_from_llm", lambda name: None)
+    monkeypatch.setattr(af, "_attach_reference_images", lambda art: art)
+
+    assert af.get_art_features("mona_lisa").mood == af.FALLBACK_FEATURES.mood
+    assert af.warm_art_features(["mona_lisa"]) == {"mona_lisa": False}
+    assert not (tmp_path / "art_features.json").exists()
@@ -0,0 +1,50 @@
+import json
+import pytest
+from workflow import batch
+from workflow.batch import Checkpoint, load_batch, run_batch
+
+
+def test_load_batch_reads_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "books.csv"
+    csv_path.write_text("painting_id,child_name,child_age,family_value\nstarry_night, emma ,6,Sharing\n")
+    jsonl_path = tmp_path / "books.jsonl"
+    jsonl_path.write_text(json.dumps({"painting_id": "mona_lisa", "child_name": "Leo", "child_age": 5}) + "\n")
+
+    [emma] = load_batch(csv_path)
+    assert (emma.child_name, emma.child_age, emma.family_value) == ("Emma", 6, "sharing")
+    [leo] = load_batch(jsonl_path)
+    assert leo.family_value == "kindness"
+
+    jsonl_path.write_text(json.dumps({"painting_id": "mona_lisa", "child_name": "Leo", "child_age": 40}) + "\n")
+    with pytest.raises(ValueError, match="entry #1"):
+        load_batch(jsonl_path)
+
+
+def test_run_batch_dedupes_checkpoints_and_reports(tmp_path, monkeypatch):
+    built, warmed = [], []
+
+    def fake_build(cfg, key, output_dir):
+        if cfg.child_name == "Bad":
+            raise RuntimeError("boom")
+        built.append(cfg.child_name)
+        return output_dir / f"{cfg.child_name}.pdf", {}
+
+    monkeypatch.setattr(batch, "_build_book", fake_build)
+    monkeypatch.setattr(batch, "get_art_features", lambda painting_id: painting_id)
+    monkeypatch.setattr(batch, "warm_shared_references", warmed.append)
+
+    path = tmp_path / "books.jsonl"
+    rows = [("starry_night", "Emma"), ("starry_night", "emma"), ("mona_lisa", "Leo"), ("mona_lisa", "Bad")]
+    path.write_text("".join(json.dumps({"painting_id": p, "child_name": n, "child_age": 6}) + "\n" for p, n in rows))
+    checkpoint = Checkpoint(tmp_path / "books.checkpoint.jsonl")
+
+    report = run_batch(load_batch(path), tmp_path, checkpoint, workers=2)
+    assert sorted(built) == ["Emma", "Leo"]
+    assert sorted(warmed) == ["mona_lisa", "starry_night"]  # once per painting
+    assert (report["items"], report["unique"], report["succeeded"]) == (4, 3, 2)
+    assert report["failed"][0]["error"] == "boom"
+    assert report["latency_seconds"]["max"] >= 0
+
+    again = run_batch(load_batch(path), tmp_path, Checkpoint(checkpoint.path), workers=2)
+    assert sorted(built) == ["Emma", "Leo"]  # only the failed item is retried
+    assert again["skipped"] == 2
@@ -0,0 +1,37 @@
+import os
+import time
+from pathlib import Path
+from workflow.cache import ResponseCache, content_key, evict_lru
+
+
+def test_content_key_is_order_independent():
+    assert content_key({"a": 1, "b": 2}) == content_key({"b": 2, "a": 1})
+    assert content_key({"a": 1}) != content_key({"a": 2})
+
+
+def test_evict_lru_drops_oldest_until_under_budget(tmp_path: Path):
+    now = time.time()
+    for i in range(4):
+        path = tmp_path / f"f{i}.bin"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - 100 + i, now - 100 + i))
+
+    result = evict_lru(tmp_path, max_bytes=250)
+    assert result == {"removed": 2, "bytes": 200}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["f2.bin", "f3.bin"]
+
+
+def test_response_cache_expires_entries(tmp_path: Path):
+    cache = ResponseCache(tmp_path, max_bytes=1024, ttl=0)
+    cache.put("ab" * 32, {"v": 1})
+    time.sleep(0.01)
+    assert cache.get("ab" * 32) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_response_cache_overwrites_do_not_inflate_usage(tmp_path: Path):
+    cache = ResponseCache(tmp_path, max_bytes=10_000)
+    for i in range(20):
+        cache.put("cd" * 32, {"v": i % 10})
+    assert cache.stats()["bytes"] == (tmp_path / "cd" / f"{'cd' * 32}.json").stat().st_size
+    assert cache.stats()["evictions"] == 0
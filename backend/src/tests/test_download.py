@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+from web import routes
+from web.main import app
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "OUTPUT_DIR", tmp_path)
+    path = tmp_path / "book_Emma_0123456789ab.pdf"
+    path.write_bytes(b"%PDF-" + bytes(range(256)) * 4)
+    return path
+
+
+def test_download_supports_ranges_and_validators(book):
+    client = TestClient(app)
+    full = client.get(f"/api/download/{book.name}")
+    assert full.status_code == 200
+    assert full.content == book.read_bytes()
+    assert "immutable" in full.headers["cache-control"]
+    etag = full.headers["etag"]
+
+    part = client.get(f"/api/download/{book.name}", headers={"Range": "bytes=5-14"})
+    assert part.status_code == 206
+    assert part.content == book.read_bytes()[5:15]
+
+    assert client.get(f"/api/download/{book.name}", headers={"If-None-Match": etag}).status_code == 304
+    since = full.headers["last-modified"]
+    assert client.get(f"/api/download/{book.name}", headers={"If-Modified-Since": since}).status_code == 304
+
+
+def test_download_accel_redirect_and_traversal(book, monkeypatch):
+    monkeypatch.setattr(routes, "DOWNLOAD_ACCEL_PREFIX", "/_protected/output/")
+    client = TestClient(app)
+    response = client.get(f"/api/download/{book.name}")
+    assert response.headers["x-accel-redirect"] == f"/_protected/output/{book.name}"
+    assert response.content == b""
+
+    assert client.get("/api/download/..%2F..%2Fetc%2Fpasswd").status_code == 404
+
+
+def test_download_serves_only_api_published_books(book):
+    (book.parent / "memory.db").write_bytes(b"SQLite format 3")
+    (book.parent / "book_Emma.pdf").write_bytes(b"%PDF-")  # rewritten by every CLI run
+    client = TestClient(app)
+    assert client.get(f"/api/download/{book.name}").status_code == 200
+    assert client.get("/api/download/memory.db").status_code == 404
+    assert client.get("/api/download/book_Emma.pdf").status_code == 404
+
+
+def test_page_previews_and_manifest(tmp_path, monkeypatch):
+    from PIL import Image
+    from web.jobs import Job
+    from workflow.previews import make_previews
+    from workflow.workspace import Workspace
+
+    monkeypatch.setattr(routes, "OUTPUT_DIR", tmp_path)
+    job = Job(id="job1", request=None)
+    monkeypatch.setitem(routes.jobs._jobs, job.id, job)
+    src = tmp_path / "page.png"
+    Image.new("RGB", (1536, 1536), (200, 120, 40)).save(src)
+    written = make_previews(src, Workspace.create(tmp_path, job.id).previews_dir, 0)
+    assert set(written) == {"thumb", "medium"}
+
+    client = TestClient(app)
+    manifest = client.get(f"/api/jobs/{job.id}/manifest")
+    assert manifest.status_code == 200
+    page = manifest.json()["pages"][0]
+    assert (page["thumb"]["width"], page["medium"]["width"]) == (256, 1024)
+    assert page["thumb"]["bytes"] < src.stat().st_size
+    etag = manifest.headers["etag"]
+    assert client.get(f"/api/jobs/{job.id}/manifest", headers={"If-None-Match": etag}).status_code == 304
+
+    thumb = client.get(page["thumb"]["url"])
+    assert thumb.headers["content-type"] == "image/webp"
+    assert "immutable" in thumb.headers["cache-control"]
+    assert client.get(f"/api/jobs/{job.id}/pages/0/huge").status_code == 404
+    assert client.get("/api/jobs/other/pages/0/thumb").status_code == 404
@@ -0,0 +1,23 @@
+import time
+from pathlib import Path
+from PIL import Image
+import workflow.images as images
+
+
+def test_render_images_concurrent_keeps_order_and_placeholders(tmp_path: Path, monkeypatch):
+    def fake_tti(prompt, out_path):
+        time.sleep(0.2)
+        if prompt == "broken":
+            return None
+        Image.new("RGB", (8, 8), (255, 0, 0)).save(out_path)
+        return out_path
+
+    monkeypatch.setattr(images, "generate_image_from_text", fake_tti)
+    start = time.time()
+    paths = images.render_images(["cover", "broken", "back"], tmp_path, max_workers=3)
+    elapsed = time.time() - start
+
+    assert paths == [tmp_path / f"scene_{i:02d}.png" for i in (1, 2, 3)]
+    assert all(p.exists() for p in paths)
+    assert Image.open(paths[1]).getpixel((0, 0)) == (240, 240, 240)
+    assert elapsed < 0.5
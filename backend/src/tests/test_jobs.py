@@ -0,0 +1,140 @@
+import time
+import threading
+import pytest
+from web.jobs import JobManager, QueueFullError, SUCCEEDED, FAILED
+
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status not in (SUCCEEDED, FAILED) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_job_reports_stage_and_result():
+    def runner(job, report):
+        report("images", 0.5)
+        return f"/api/download/{job.request}.pdf"
+
+    manager = JobManager(runner, workers=1, queue_size=1)
+    job = manager.submit("emma")
+    _wait(job)
+    assert job.status == SUCCEEDED
+    assert job.to_dict()["result_url"] == "/api/download/emma.pdf"
+    assert manager.get(job.id) is job
+
+
+def test_job_failure_is_recorded():
+    def runner(job, report):
+        raise RuntimeError("upstream down")
+
+    manager = JobManager(runner, workers=1, queue_size=0)
+    job = manager.submit("emma")
+    _wait(job)
+    assert job.status == FAILED
+    assert job.error == "upstream down"
+
+
+def test_queue_is_bounded():
+    release = threading.Event()
+    manager = JobManager(lambda job, report: release.wait(5), workers=1, queue_size=1)
+    manager.submit("a")
+    manager.submit("b")
+    with pytest.raises(QueueFullError):
+        manager.submit("c")
+    release.set()
+
+
+def test_duplicates_attach_to_running_job_and_reuse_result():
+    release = threading.Event()
+    calls = []
+
+    def runner(job, report):
+        calls.append(job.id)
+        release.wait(5)
+        return f"/api/download/{job.id}.pdf"
+
+    manager = JobManager(runner, workers=1, queue_size=0)
+    first = manager.submit("emma", key="k1")
+    assert manager.submit("emma again", key="k1") is first  # no slot needed
+    release.set()
+    _wait(first)
+
+    assert manager.submit("emma", key="k1") is first
+    assert calls == [first.id]
+
+    manager.result_valid = lambda job: False  # e.g. the PDF was garbage-collected
+    second = manager.submit("emma", key="k1")
+    _wait(second)
+    assert second is not first and calls == [first.id, second.id]
+
+
+def test_succeeded_job_without_finish_time_is_not_reused():
+    manager = JobManager(lambda job, report: "/api/download/a.pdf", workers=1, queue_size=1)
+    job = manager.submit("a", key="k")
+    _wait(job)
+    job.finished_at = None  # a result without a finish time is never treated as fresh
+    assert manager.submit("a", key="k") is not job
+
+
+def test_request_key_normalizes():
+    from workflow.user_input import UserConfig, request_key
+
+    cfg = UserConfig("Starry_Night ", " emma", 6, "Sharing ")
+    assert request_key(cfg) == request_key(UserConfig("starry_night", "Emma", 6, "sharing"))
+    assert request_key(cfg) != request_key(UserConfig("starry_night", "Emma", 7, "sharing"))
+    assert cfg.child_name == " emma"  # the caller's config is left untouched
+
+
+def test_events_stream_stages_pages_and_result(monkeypatch):
+    from fastapi.testclient import TestClient
+    from web import routes
+    from web.main import app
+
+    def runner(job, report):
+        report("images", 0.5)
+        job.emit("page", index=0, thumbnail_url=None)
+        return "/api/download/book.pdf"
+
+    manager = JobManager(runner, workers=1, queue_size=0)
+    monkeypatch.setattr(routes, "jobs", manager)
+    job = manager.submit("emma")
+    _wait(job)
+
+    client = TestClient(app)
+    with client.stream("GET", f"/api/jobs/{job.id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    assert [line[7:] for line in body.splitlines() if line.startswith("event: ")] == \
+        ["stage", "stage", "page", "done"]
+    assert 'data: {"result_url": "/api/download/book.pdf"}' in body
+
+    resumed = client.get(f"/api/jobs/{job.id}/events", headers={"Last-Event-ID": "2"}).text
+    assert "event: page" not in resumed and "event: done" in resumed
+
+
+def test_subscribers_are_woken_by_events_from_worker_threads():
+    import asyncio
+    from web.jobs import Job
+
+    job = Job(id="j", request=None)
+
+    async def collect():
+        threading.Timer(0.05, lambda: (job.emit("page", index=0), job.emit("done", result_url="x"))).start()
+        return [event["event"] async for event in job.subscribe(keepalive=5)]
+
+    assert asyncio.run(collect()) == ["page", "done"]
+
+
+def test_resuming_after_the_terminal_event_closes_the_stream():
+    import asyncio
+    from web.jobs import Job
+
+    job = Job(id="j", request=None)
+    job.emit("stage", stage="queued", progress=0.0)
+    job.emit("done", result_url="x")
+
+    async def collect(cursor):
+        return [event async for event in job.subscribe(cursor, keepalive=0.05)]
+
+    for cursor in (2, 999):  # just past "done", and a bogus Last-Event-ID
+        assert asyncio.run(asyncio.wait_for(collect(cursor), 1)) == []
@@ -0,0 +1,132 @@
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from PIL import Image
+from reportlab.pdfgen import canvas
+from workflow.layout import ImageProfile, prepare_page_image, build_kids_pdf
+
+
+def test_prepare_page_image_downsamples_and_strips_unused_alpha(tmp_path: Path):
+    src = tmp_path / "page.png"
+    Image.new("RGBA", (2048, 2048), (10, 20, 30, 255)).save(src)
+
+    reader = prepare_page_image(src, "screen")
+    assert reader.getSize() == (1020, 1020)
+    assert reader.jpeg_fh() is not None  # embedded as JPEG without re-encoding
+
+
+def test_prepare_page_image_never_upscales_and_keeps_used_alpha_for_png(tmp_path: Path):
+    src = tmp_path / "page.png"
+    Image.new("RGBA", (512, 512), (10, 20, 30, 128)).save(src)
+
+    reader = prepare_page_image(src, ImageProfile(dpi=300, format="PNG"))
+    assert reader.getSize() == (512, 512)
+    pdf = io.BytesIO()
+    c = canvas.Canvas(pdf)
+    c.drawImage(reader, 0, 0, mask="auto")
+    c.save()
+    assert b"/SMask" in pdf.getvalue()  # alpha survives as a soft mask
+
+
+def test_unknown_image_profile_is_rejected(tmp_path: Path):
+    with pytest.raises(ValueError, match="screen"):
+        prepare_page_image(tmp_path / "page.png", "sceen")
+    env = dict(os.environ, PDF_IMAGE_PROFILE="prnt", PYTHONPATH=str(Path(__file__).resolve().parent.parent))
+    probe = subprocess.run([sys.executable, "-c", "import workflow.layout"], env=env, capture_output=True, text=True)
+    assert probe.returncode != 0 and "PDF_IMAGE_PROFILE" in probe.stderr
+
+
+def test_build_kids_pdf_with_profiles(tmp_path: Path):
+    images = []
+    for i in range(4):
+        path = tmp_path / f"scene_{i:02d}.png"
+        Image.effect_noise((384, 384), 64).convert("RGB").save(path)
+        images.append(path)
+
+    sizes = {}
+    for profile in ("screen", "print"):
+        out = build_kids_pdf("A Title", ["One.", "Two."], images, tmp_path / f"{profile}.pdf", profile)
+        sizes[profile] = out.stat().st_size
+    assert sizes["screen"] < sizes["print"]
+
+
+def test_streaming_pdf_accepts_pages_out_of_order(tmp_path: Path):
+    from workflow.layout import StreamingKidsPdf
+
+    images = []
+    for i in range(4):
+        path = tmp_path / f"scene_{i:02d}.png"
+        Image.new("RGB", (64, 64), (i * 60, 0, 0)).save(path)
+        images.append(path)
+
+    book = StreamingKidsPdf("A Title", len(images), tmp_path / "book.pdf")
+    book.add_image(3, images[3])
+    book.add_image(0, images[0])  # cover is drawn right away
+    assert book._next == 1
+    book.add_image(2, images[2])
+    book.set_chapters(["One.", "Two."])
+    book.add_image(1, images[1])
+    assert book.finish().stat().st_size > 0
+
+
+def test_text_layout_matches_reportlab_widths_and_balances_lines():
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from workflow.text_layout import break_lines, text_width, word_width
+
+    assert abs(word_width("Élodie's", "Times-Roman", 24) - stringWidth("Élodie's", "Times-Roman", 24)) < 1e-6
+
+    text = ("Emma found a tiny star under her bed and decided that the kindest thing to do "
+            "was to share its warm golden light with every single friend in the whole village. ") * 3
+    width = 400
+    greedy = break_lines(text, width, "Times-Roman", 24, mode="greedy")
+    optimal = break_lines(text, width, "Times-Roman", 24, mode="optimal")
+
+    assert " ".join(optimal).split() == text.split()
+    assert all(text_width(line, "Times-Roman", 24) <= width for line in optimal)
+
+    def raggedness(lines):
+        return sum((width - text_width(line, "Times-Roman", 24)) ** 2 for line in lines[:-1])
+
+    assert raggedness(optimal) <= raggedness(greedy)
+    # Courier at 10 pt is 6 pt per character: a six-character line.
+    assert break_lines("aaa bb cc ddddd", 36, "Courier", 10, mode="greedy") == ["aaa bb", "cc", "ddddd"]
+    assert break_lines("aaa bb cc ddddd", 36, "Courier", 10, mode="optimal") == ["aaa", "bb cc", "ddddd"]
+    assert break_lines("Supercalifragilistic", 50, "Times-Roman", 24) == ["Supercalifragilistic"]
+
+
+def test_pdf_pool_renders_in_worker_process(tmp_path: Path):
+    from workflow.pdf_pool import PdfRenderPool
+
+    images = []
+    for i in range(3):
+        path = tmp_path / f"page_{i}.png"
+        Image.new("RGB", (64, 64), (40 * i, 80, 120)).save(path)
+        images.append(path)
+    dest = tmp_path / "out" / "book.pdf"
+
+    pool = PdfRenderPool(workers=1, queue_size=0)
+    try:
+        assert pool.render("Title", ["Once upon a time."], images, dest) == dest
+    finally:
+        pool.shutdown()
+    assert dest.read_bytes().startswith(b"%PDF")
+    assert [p.name for p in dest.parent.iterdir()] == ["book.pdf"]
+
+
+def test_prepared_pages_build_the_same_book(tmp_path: Path):
+    from workflow.layout import prepare_page_file
+
+    images = []
+    for i in range(3):
+        path = tmp_path / f"page_{i}.png"
+        Image.new("RGB", (2048, 2048), (40 * i, 80, 120)).save(path)
+        images.append(path)
+    prepared = [prepare_page_file(p, tmp_path / "prepared", "screen") for p in images]
+    assert all(p.suffix == ".jpeg" and Image.open(p).size == (1020, 1020) for p in prepared)
+
+    direct = build_kids_pdf("T", ["One."], images, tmp_path / "direct.pdf", "screen")
+    reused = build_kids_pdf("T", ["One."], prepared, tmp_path / "reused.pdf", "screen", prepared=True)
+    assert abs(direct.stat().st_size - reused.stat().st_size) < 1024
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+from workflow.limiter import AdaptiveLimiter, parse_retry_after
+
+
+def test_limit_caps_concurrency_and_grows_on_success():
+    limiter = AdaptiveLimiter("t-cap", max_limit=4, initial=2)
+    peak = 0
+    running = 0
+
+    async def call():
+        nonlocal peak, running
+        async with limiter.slot() as slot:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            slot.observe(200)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak <= 4
+    assert limiter.snapshot()["limit"] == 4  # additive increase up to the cap
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_throttle_halves_limit_and_honours_retry_after():
+    limiter = AdaptiveLimiter("t-429", max_limit=8, cooldown=0)
+
+    async def main():
+        async with limiter.slot() as slot:
+            slot.observe(429, "0.2")
+        start = time.perf_counter()
+        async with limiter.slot() as slot:
+            slot.observe(200)
+        return time.perf_counter() - start
+
+    waited = asyncio.run(main())
+    assert waited >= 0.15
+    assert 4 <= limiter.snapshot()["limit"] < 5
+
+
+def test_budget_is_shared_through_state_file(tmp_path):
+    state = tmp_path / "limits.json"
+    a = AdaptiveLimiter("images", max_limit=4, state_path=state, cooldown=0)
+    b = AdaptiveLimiter("images", max_limit=4, state_path=state, cooldown=0)
+
+    async def main():
+        async with a.slot() as slot:
+            assert b.snapshot()["in_flight"] == 1
+            slot.observe(503)
+
+    asyncio.run(main())
+    assert b.snapshot() == {"limit": 2.0, "in_flight": 0, "paused_for": 0.0}
+
+
+def test_shared_lock_contention_does_not_block_the_event_loop(tmp_path):
+    import fcntl
+
+    state = tmp_path / "limits.json"
+    limiter = AdaptiveLimiter("images", max_limit=2, state_path=state)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        with open(state, "a+") as f:  # another process holding the budget lock
+            fcntl.flock(f, fcntl.LOCK_EX)
+            acquire = asyncio.create_task(limiter._acquire())
+            await asyncio.sleep(0.2)
+            fcntl.flock(f, fcntl.LOCK_UN)
+        await acquire
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+    assert limiter.snapshot()["in_flight"] == 1
+
+
+def test_stale_shared_slots_are_reaped(tmp_path):
+    state = tmp_path / "limits.json"
+    state.write_text(json.dumps({"images": {"limit": 2.0, "paused_until": 0.0, "last_decrease": 0.0,
+                                            "in_flight": {"1": 2}, "seen": {"1": time.time() - 3600}}}))
+    limiter = AdaptiveLimiter("images", max_limit=2, state_path=state)
+    assert limiter.snapshot()["in_flight"] == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert 0 < parse_retry_after(time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))) <= 30
@@ -0,0 +1,47 @@
+import json
+import threading
+from workflow.memory import MemoryStore
+
+
+def test_put_and_query_by_index(tmp_path):
+    store = MemoryStore(tmp_path / "memory.db")
+    store.put_session({"child_name": "Emma", "painting": "The Starry Night", "pdf": "a.pdf"})
+    store.put_session({"child_name": "Leo", "painting": "The Starry Night", "pdf": "b.pdf"})
+    store.put_session({"child_name": "Emma", "painting": "Water Lilies", "pdf": "c.pdf"})
+
+    assert [s["pdf"] for s in store.query(child_name="Emma")] == ["c.pdf", "a.pdf"]
+    assert [s["pdf"] for s in store.query(painting="The Starry Night")] == ["b.pdf", "a.pdf"]
+    assert len(store.query(limit=1)) == 1
+    assert [s["pdf"] for s in store.load()["sessions"]] == ["a.pdf", "b.pdf", "c.pdf"]
+
+    plan = store._conn().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE child_name = ? ORDER BY created_at DESC", ("Emma",)).fetchall()
+    assert "sessions_child" in str(plan)
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "memory.json"
+    legacy.write_text(json.dumps({"sessions": [{"child_name": "Emma", "pdf": "old.pdf"}]}))
+
+    MemoryStore(tmp_path / "memory.db")
+    store = MemoryStore(tmp_path / "memory.db")
+    assert [s["pdf"] for s in store.load()["sessions"]] == ["old.pdf"]
+    assert not legacy.exists()
+
+
+def test_concurrent_writers_and_compaction(tmp_path):
+    stores = [MemoryStore(tmp_path / "memory.db") for _ in range(2)]
+
+    def write(store, child):
+        for i in range(25):
+            store.put_session({"child_name": child, "n": i})
+
+    threads = [threading.Thread(target=write, args=(stores[i % 2], f"kid{i}")) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(stores[0].load()["sessions"]) == 100
+    assert stores[0].compact(keep_per_child=5) == 80
+    assert [s["n"] for s in stores[1].query(child_name="kid0")] == [24, 23, 22, 21, 20]
@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+from workflow.metrics import Histogram, Counter
+from web.main import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("demo_seconds", "Demo.", ("stage",), buckets=(1, 5))
+    hist.observe(0.5, stage="a")
+    hist.observe(3, stage="a")
+    lines = hist.render()
+    assert 'demo_seconds_bucket{stage="a",le="1"} 1.0' in lines
+    assert 'demo_seconds_bucket{stage="a",le="5"} 2.0' in lines
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 2.0' in lines
+    assert 'demo_seconds_sum{stage="a"} 3.5' in lines
+
+
+def test_counter_labels():
+    counter = Counter("demo_total", "Demo.", ("kind",))
+    counter.inc(kind="page_placeholder")
+    counter.inc(2, kind="page_placeholder")
+    assert counter.value(kind="page_placeholder") == 3
+
+
+def test_metrics_endpoint_reports_requests():
+    client = TestClient(app)
+    assert client.get("/api/jobs/missing").status_code == 404
+    body = client.get("/api/metrics").text
+    assert 'kidsbook_http_requests_total{route="/jobs/{job_id}",method="GET",status="404"} 1' in body
+    assert "# TYPE kidsbook_stage_seconds histogram" in body
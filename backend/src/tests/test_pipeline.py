@@ -0,0 +1,46 @@
+import time
+from pathlib import Path
+import pytest
+import ai_clients
+from workflow.pipeline import Pipeline, PipelineError, Stage, run_book
+from workflow.user_input import UserConfig
+
+
+def test_independent_stages_overlap():
+    def slow(value):
+        time.sleep(0.2)
+        return value
+
+    pipeline = Pipeline([
+        Stage("a", lambda seed: slow(seed + 1), ("seed",), ("a",)),
+        Stage("b", lambda seed: slow(seed + 2), ("seed",), ("b",)),
+        Stage("sum", lambda a, b: (a + b, a * b), ("a", "b"), ("total", "product")),
+    ])
+    events = []
+    start = time.time()
+    ctx = pipeline.run({"seed": 1}, on_event=lambda name, status, info: events.append((name, status)))
+
+    assert time.time() - start < 0.35
+    assert (ctx["total"], ctx["product"]) == (5, 6)
+    assert events[-1] == ("sum", "finished")
+
+
+def test_unsatisfiable_inputs_raise():
+    with pytest.raises(PipelineError):
+        Pipeline([Stage("a", lambda missing: missing, ("missing",), ("a",))]).run({})
+
+
+@pytest.mark.parametrize("mode", ["streaming", "process"])
+def test_book_pipeline_runs_offline_with_fallbacks(tmp_path: Path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ai_clients, "API_KEY", None)
+    cfg = UserConfig("starry_night", "Emma", 6, "sharing")
+
+    ctx = run_book(cfg, tmp_path / "refs", tmp_path / "images", tmp_path / "book.pdf", mode=mode)
+    if mode == "process":
+        from workflow.pdf_pool import pdf_pool
+        pdf_pool.shutdown()
+        assert len(list((tmp_path / "images" / "prepared").iterdir())) == len(ctx["images"])
+
+    assert (tmp_path / "book.pdf").stat().st_size > 0
+    assert len(ctx["images"]) == len(ctx["chapters"]) + 2
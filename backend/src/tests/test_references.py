@@ -0,0 +1,35 @@
+from pathlib import Path
+from PIL import Image
+import workflow.references as references
+from workflow.art_features import ArtFeatures
+
+
+def test_reference_cache_shares_child_independent_assets(tmp_path: Path, monkeypatch):
+    generated = []
+
+    def fake_tti(prompt, out_path):
+        generated.append(prompt)
+        Image.new("RGB", (8, 8)).save(out_path)
+        return out_path
+
+    monkeypatch.setattr(references, "generate_image_from_text", fake_tti)
+    cache = tmp_path / "cache"
+    starry = ArtFeatures(colors=["blue"], mood="dreamy", style="impressionism", brushwork="swirls")
+    scream = ArtFeatures(colors=["orange"], mood="anxious", style="expressionism", brushwork="waves")
+
+    emma = references.generate_reference_images("Emma", starry, tmp_path / "emma", cache_dir=cache)
+    references.generate_reference_images("Louise", starry, tmp_path / "louise", cache_dir=cache)
+    assert len(generated) == 4  # 3 for Emma, only the hero for Louise
+    assert all(p.exists() for p in emma.values())
+
+    references.generate_reference_images("Emma", scream, tmp_path / "emma2", cache_dir=cache)
+    assert len(generated) == 7  # a different painting changes every prompt
+
+
+def test_failed_reference_uses_uncached_placeholder(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(references, "generate_image_from_text", lambda prompt, out_path: None)
+    art = ArtFeatures(colors=["blue"], mood="dreamy", style="impressionism", brushwork="swirls")
+
+    refs = references.generate_reference_images("Emma", art, tmp_path / "emma", cache_dir=tmp_path / "cache")
+    assert all(p.exists() for p in refs.values())
+    assert list((tmp_path / "cache").iterdir()) == []
@@ -0,0 +1,44 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent
+# Generous enough for slow CI machines; the API imports in ~0.25 s on a laptop.
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5"))
+# dotenv is the exception: web.main loads .env first so import-time settings see it.
+DEFERRED_MODULES = ("openai", "PIL", "reportlab", "rich", "httpx", "tenacity", "ai_clients", "workflow.pipeline")
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start, "loaded": sorted(set(sys.modules)),
+                  "output_dir": str(sys.modules["web.services"].OUTPUT_DIR) if "web.services" in sys.modules else None}}))
+"""
+
+
+def _probe(module: str, cwd: Path, **env_vars) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(SRC), WARM_ART_FEATURES="0", **env_vars)
+    out = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=cwd, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_api_import_is_fast_and_defers_heavy_modules(tmp_path):
+    result = _probe("web.main", tmp_path)
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+    assert [m for m in DEFERRED_MODULES if m in result["loaded"]] == []
+
+
+def test_imports_have_no_filesystem_side_effects(tmp_path):
+    for module in ("web.main", "kidsbook"):
+        _probe(module, tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dotenv_settings_apply_to_import_time_config(tmp_path, monkeypatch):
+    monkeypatch.delenv("OUTPUT_DIR", raising=False)
+    (tmp_path / ".env").write_text("OUTPUT_DIR=/srv/books\n")
+    assert _probe("web.main", tmp_path)["output_dir"] == "/srv/books"
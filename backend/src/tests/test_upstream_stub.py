@@ -0,0 +1,36 @@
+from pathlib import Path
+import httpx
+from fastapi.testclient import TestClient
+import ai_clients
+from scripts.upstream_stub import StubConfig, Latency, create_app
+
+
+def test_stub_replays_canned_and_recorded_responses(tmp_path: Path):
+    client = TestClient(create_app(StubConfig(recordings=tmp_path)))
+    text = client.post("/v1/chat/completions", json={"model": "m", "messages": []}).json()
+    assert text["choices"][0]["message"]["content"]
+
+    image = client.post("/v1/images/generations", json={"model": "m", "prompt": "a star"}).json()
+    url = image["data"][0]["url"]
+    assert client.get(url).headers["content-type"] == "image/png"
+
+
+def test_stub_injects_errors_with_retry_after(tmp_path: Path):
+    config = StubConfig(recordings=tmp_path, error_rate=1.0, error_statuses=[429], retry_after=3,
+                        latency={"chat": Latency.parse("uniform:0,0.01")}, seed=1)
+    response = TestClient(create_app(config)).post("/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+
+
+def test_ai_clients_run_against_stub(tmp_path: Path, monkeypatch):
+    stub = create_app(StubConfig(recordings=tmp_path / "recordings"))
+    monkeypatch.setattr(ai_clients, "API_KEY", "stub")
+    monkeypatch.setattr(
+        ai_clients, "get_async_client",
+        lambda: httpx.AsyncClient(base_url="http://stub/v1", transport=httpx.ASGITransport(app=stub)),
+    )
+
+    assert ai_clients.generate_json("sys", "outline please")["book_title"]
+    out = ai_clients.generate_image_from_text("a star", tmp_path / "star.png")
+    assert out == tmp_path / "star.png" and out.stat().st_size > 0
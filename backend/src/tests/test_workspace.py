@@ -0,0 +1,63 @@
+import os
+import time
+from workflow.workspace import Workspace, collect_garbage, publish
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    for p in [path, *path.rglob("*")] if path.is_dir() else [path]:
+        os.utime(p, (past, past))
+
+
+def test_publish_moves_finished_pdf(tmp_path):
+    ws = Workspace.create(tmp_path, "job1")
+    ws.pdf_path.write_bytes(b"%PDF-1.4")
+    dest = publish(ws.pdf_path, tmp_path / "book_Emma_job1.pdf")
+    assert dest.read_bytes() == b"%PDF-1.4"
+    assert not ws.pdf_path.exists()
+
+
+def test_collector_enforces_age_and_size_but_keeps_shared_assets(tmp_path):
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "ref.png").write_bytes(b"x" * 1000)
+    (tmp_path / "memory.db").write_bytes(b"db")
+    _age(tmp_path / "cache", 10_000)
+
+    old, running, recent = (Workspace.create(tmp_path, j) for j in ("old", "running", "recent"))
+    for ws in (old, running, recent):
+        ws.images_dir.mkdir()
+        (ws.images_dir / "page_01.png").write_bytes(b"x" * 100)
+    _age(old.root, 10_000)
+    _age(running.root, 10_000)
+    (tmp_path / "book_a_00000000000a.pdf").write_bytes(b"x" * 300)
+    _age(tmp_path / "book_a_00000000000a.pdf", 50)
+    (tmp_path / "book_b_00000000000b.pdf").write_bytes(b"x" * 300)
+
+    stats = collect_garbage(tmp_path, max_age=3600, max_bytes=500, active=["running"])
+
+    assert not old.root.exists()
+    assert running.root.exists()
+    assert not (tmp_path / "book_a_00000000000a.pdf").exists()  # oldest remaining unit, over quota
+    assert (tmp_path / "book_b_00000000000b.pdf").exists() and recent.root.exists()
+    assert (tmp_path / "cache" / "ref.png").exists() and (tmp_path / "memory.db").exists()
+    assert stats == {"removed": 2, "bytes": 400}
+
+
+def test_collector_only_touches_job_workspaces_and_api_books(tmp_path):
+    cli_images = tmp_path / "images" / "emma"
+    cli_images.mkdir(parents=True)
+    (cli_images / "page_01.png").write_bytes(b"x" * 100)
+    (tmp_path / "book_Emma.pdf").write_bytes(b"x" * 100)
+    batch = Workspace.create(tmp_path, "batch-abc")
+    batch.pdf_path.write_bytes(b"x" * 100)
+    for path in (tmp_path / "images", tmp_path / "book_Emma.pdf"):
+        _age(path, 10_000)
+
+    with batch.hold():
+        _age(batch.root, 10_000)
+        collect_garbage(tmp_path, max_age=3600, max_bytes=0)
+        assert batch.root.exists()
+
+    assert (cli_images / "page_01.png").exists() and (tmp_path / "book_Emma.pdf").exists()
+    collect_garbage(tmp_path, max_age=3600, max_bytes=0)
+    assert not batch.root.exists()
@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Published book files never change once written (their names carry the job ID).
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# When set (e.g. "/_protected/output/"), nginx serves the bytes via X-Accel-Redirect.
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX")
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator derived from inode, size and nanosecond mtime."""
+    base = f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+    return '"' + hashlib.sha1(base.encode()).hexdigest()[:24] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> Optional[bool]:
+    """None when the request carries no If-None-Match."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    matches = _etag_matches(request, etag)
+    if matches is not None:
+        return matches
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def serve_file(request: Request, path: Path, media_type: Optional[str] = None,
+               cache_control: str = IMMUTABLE_CACHE_CONTROL,
+               accel_path: Optional[str] = None) -> Response:
+    """
+    Serve a file with ETag/Last-Modified validators, 304 handling and byte ranges
+    (ranges and If-Range are handled by FileResponse). With `accel_path`, only
+    headers are sent and nginx streams the file itself.
+    """
+    st = path.stat()
+    etag = file_etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+    if accel_path:
+        headers["X-Accel-Redirect"] = accel_path
+        return Response(headers=headers, media_type=media_type or "application/octet-stream")
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
+
+
+def serve_json(request: Request, body, cache_control: str = "private, no-cache") -> Response:
+    """JSON with a content-hash ETag, answering 304 when the client's copy is current."""
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha1(encoded).hexdigest()[:24] + '"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(encoded, media_type="application/json", headers=headers)
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from workflow.metrics import JOBS_DEDUPLICATED
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+# How long a finished book is handed out again for an identical request (0 disables).
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+# Finished job records are kept at least this long so clients can still poll them.
+JOB_RETENTION = 3600.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+TERMINAL_EVENTS = ("done", "failed")
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another book."""
+
+
+@dataclass
+class Job:
+    id: str
+    request: object
+    key: Optional[str] = None
+    status: str = QUEUED
+    stage: str = "queued"
+    progress: float = 0.0
+    result_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # Progress events ({"id", "event", "data"}) replayed to every subscriber.
+    events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    _listeners: List = field(default_factory=list, repr=False)
+    _events_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def emit(self, event: str, **data):
+        """Record a progress event and wake subscribers (callable from any thread)."""
+        with self._events_lock:
+            self.events.append({"id": len(self.events), "event": event, "data": data})
+            listeners = list(self._listeners)
+        for loop, wakeup in listeners:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:  # subscriber's loop is gone
+                pass
+
+    async def subscribe(self, cursor: int = 0, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield events from `cursor` on, as they happen, until the job finishes;
+        a cursor past a finished job's last event ends at once. Yields None after `keepalive` seconds without news so callers can ping.
+        """
+        wakeup = asyncio.Event()
+        listener = (asyncio.get_running_loop(), wakeup)
+        with self._events_lock:
+            self._listeners.append(listener)
+        try:
+            while True:
+                wakeup.clear()
+                with self._events_lock:
+                    cursor = max(0, min(cursor, len(self.events)))  # e.g. a bogus Last-Event-ID
+                    pending = self.events[cursor:]
+                    finished = bool(self.events) and self.events[-1]["event"] in TERMINAL_EVENTS
+                for event in pending:
+                    cursor = event["id"] + 1
+                    yield event
+                    if event["event"] in TERMINAL_EVENTS:
+                        return
+                if not pending:
+                    if finished:  # resumed at or past the terminal event
+                        return
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), keepalive)
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            with self._events_lock:
+                self._listeners.remove(listener)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "result_url": self.result_url,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs book jobs on a bounded thread pool so the event loop stays free.
+    At most `workers` books run at once and at most `queue_size` wait behind them.
+
+    Jobs submitted with a `key` are coalesced: a duplicate of a queued or running
+    job gets that job back, and a duplicate of a book finished within
+    `result_ttl` seconds gets the finished job (if `result_valid(job)` agrees).
+    """
+
+    def __init__(self, runner: Callable, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE,
+                 result_ttl: float = RESULT_CACHE_TTL, result_valid: Optional[Callable[[Job], bool]] = None):
+        self.runner = runner
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.result_valid = result_valid
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="book-job")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, request, key: Optional[str] = None) -> Job:
+        with self._lock:
+            self._prune()
+            existing = self._by_key.get(key) if key else None
+            if existing and existing.status in (QUEUED, RUNNING):
+                JOBS_DEDUPLICATED.inc(source="in_flight")
+                return existing
+            if existing and existing.status == SUCCEEDED and self._fresh(existing):
+                JOBS_DEDUPLICATED.inc(source="result_cache")
+                return existing
+            if not self._slots.acquire(blocking=False):
+                raise QueueFullError("Too many books in progress, please retry shortly.")
+            job = Job(id=uuid.uuid4().hex[:12], request=request, key=key)
+            job.emit("stage", stage=job.stage, progress=0.0)
+            self._jobs[job.id] = job
+            if key:
+                self._by_key[key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def active_ids(self) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job.status in (QUEUED, RUNNING)]
+
+    def _fresh(self, job: Job) -> bool:
+        if job.finished_at is None or time.time() - job.finished_at >= self.result_ttl:
+            return False
+        return self.result_valid is None or self.result_valid(job)
+
+    def _prune(self):
+        horizon = time.time() - max(self.result_ttl, JOB_RETENTION)
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < horizon:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job):
+        def report(stage: str, progress: float):
+            job.stage = stage
+            job.progress = progress
+            job.emit("stage", stage=stage, progress=round(progress, 3))
+
+        with self._lock:
+            job.status = RUNNING
+        try:
+            result_url = self.runner(job, report)
+            with self._lock:
+                # finished_at first: submit() may check freshness as soon as it sees SUCCEEDED.
+                job.finished_at = time.time()
+                job.result_url = result_url
+                job.stage = "done"
+                job.progress = 1.0
+                job.status = SUCCEEDED
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job.finished_at = time.time()
+                job.error = str(e)
+                job.status = FAILED
+        finally:
+            self._slots.release()
+            if job.status == SUCCEEDED:
+                job.emit("done", result_url=job.result_url)
+            else:
+                job.emit("failed", error=job.error)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,47 @@
-from fastapi import FastAPI
+import os
+import sys
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from dotenv import find_dotenv, load_dotenv
+
+# Before the app modules below read their settings from the environment.
+load_dotenv(find_dotenv(usecwd=True))
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import router
+from workflow.metrics import HTTP_REQUESTS, HTTP_SECONDS
+from workflow.workspace import GarbageCollector
+from .routes import router, jobs
+from .services import OUTPUT_DIR
+
+
+def _warm_art_features():
+    # Imported here so the pipeline modules load in the background, not during startup.
+    from workflow.art_features import warm_art_features
+
+    warm_art_features()
 
-app = FastAPI(title="KidsBookAI API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("WARM_ART_FEATURES", "1") == "1":
+        # Warm in the background so startup is not blocked on the LLM.
+        asyncio.get_running_loop().run_in_executor(None, _warm_art_features)
+    collector = GarbageCollector(OUTPUT_DIR, active=jobs.active_ids)
+    collector.start()
+    yield
+    collector.stop()
+    jobs.shutdown()
+    pdf_pool = sys.modules.get("workflow.pdf_pool")
+    if pdf_pool is not None:
+        pdf_pool.pdf_pool.shutdown()
+    ai_clients = sys.modules.get("ai_clients")
+    if ai_clients is not None:  # only if a job or endpoint ever loaded it
+        await ai_clients.aclose_client()
+
+
+app = FastAPI(title="KidsBookAI API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -10,5 +49,20 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"]
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded.
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+
 # Add the prefix="/api" to all routes from the router
-app.include_router(router, prefix="/api")
\ No newline at end of file
+app.include_router(router, prefix="/api")
@@ -1,20 +1,108 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from pathlib import Path
-from .schemas import GenerateRequest, GenerateResponse
-from .services import generate_book_service
-import os
+import json
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Optional
+from urllib.parse import quote
+from .schemas import GenerateRequest, GenerateResponse, JobStatusResponse
+from .services import OUTPUT_DIR, generate_book, preview_url, request_key_for, result_exists, validate_request
+from .jobs import JobManager, QueueFullError
+from .files import DOWNLOAD_ACCEL_PREFIX, serve_file, serve_json
+from workflow.workspace import PUBLISHED_BOOK, Workspace
+from workflow.metrics import REGISTRY
+
+# A page's previews never change once written; they are per-child, hence private.
+PREVIEW_CACHE_CONTROL = "private, max-age=604800, immutable"
 
 router = APIRouter()
+jobs = JobManager(generate_book, result_valid=result_exists)
 
-@router.post("/generate", response_model=GenerateResponse)
+@router.post("/generate", response_model=GenerateResponse, status_code=202)
 async def generate(req: GenerateRequest):
-    url = await generate_book_service(req)
-    return GenerateResponse(download_url=url)
+    validate_request(req)
+    try:
+        job = jobs.submit(req, key=request_key_for(req))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return GenerateResponse(job_id=job.id, status_url=f"/api/jobs/{job.id}",
+                            events_url=f"/api/jobs/{job.id}/events")
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job.to_dict())
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: Optional[int] = Header(None)):
+    """
+    Server-sent events: `stage` transitions, `page` previews as illustrations
+    land, then `done` or `failed`. Reconnecting clients resume via Last-Event-ID.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        cursor = 0 if last_event_id is None else last_event_id + 1
+        async for event in job.subscribe(cursor):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/jobs/{job_id}/manifest")
+async def page_manifest(job_id: str, request: Request):
+    """
+    Page previews available so far, with URLs, pixel sizes and byte counts.
+    Grows while the job runs, so clients revalidate it with its ETag.
+    """
+    from workflow.previews import page_manifest as list_pages
+
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    pages = list_pages(Workspace(OUTPUT_DIR / "jobs" / job_id).previews_dir)
+    for page in pages:
+        for size in page.keys() - {"index"}:
+            page[size]["url"] = preview_url(job_id, page["index"], size)
+    return serve_json(request, {"job_id": job_id, "status": job.status, "pdf_url": job.result_url,
+                                "pages": pages})
 
-@router.get("/download/{filename}")
-async def download(filename: str):
-    path = Path(os.getenv("OUTPUT_DIR", "output")) / filename
-    if not path.exists():
+@router.get("/jobs/{job_id}/pages/{index}/{size}")
+async def page_preview(job_id: str, index: int, size: str, request: Request):
+    from workflow.previews import PREVIEW_SIZES, preview_path
+
+    if size not in PREVIEW_SIZES or not jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Preview not found")
+    path = preview_path(Workspace(OUTPUT_DIR / "jobs" / job_id).previews_dir, index, size)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Preview not found")
+    return serve_file(request, path, media_type="image/webp", cache_control=PREVIEW_CACHE_CONTROL)
+
+@router.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download(filename: str, request: Request):
+    # Only books the API published: their names carry the job ID, so they never change.
+    if not PUBLISHED_BOOK.fullmatch(filename):
+        raise HTTPException(status_code=404, detail="File not found")
+    root = OUTPUT_DIR.resolve()
+    path = (root / filename).resolve()
+    if path.parent != root or not path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path)
+    accel_path = DOWNLOAD_ACCEL_PREFIX.rstrip("/") + "/" + quote(path.name) if DOWNLOAD_ACCEL_PREFIX else None
+    return serve_file(request, path, media_type="application/pdf" if path.suffix == ".pdf" else None,
+                      accel_path=accel_path)
+
+@router.get("/upstream")
+def upstream():
+    """Circuit breaker and concurrency budget state for the AI upstream (may read the shared budget file)."""
+    from ai_clients import upstream_status
+
+    return upstream_status()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, Field
 
 class GenerateRequest(BaseModel):
@@ -8,4 +9,14 @@ class GenerateRequest(BaseModel):
     fallback: bool = False
 
 class GenerateResponse(BaseModel):
-    download_url: str
+    job_id: str
+    status_url: str
+    events_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., examples=["running"])
+    stage: str = Field(..., examples=["images"])
+    progress: float = Field(..., ge=0, le=1)
+    result_url: Optional[str] = None
+    error: Optional[str] = None
@@ -1,77 +1,115 @@
 import os
 from pathlib import Path
 from fastapi import HTTPException
-from workflow.user_input import UserConfig, validate_user_config, PAINTINGS
-from workflow.art_features import extract_art_features
-from workflow.story import create_outline, write_full_story
-from workflow.images import prompts_for_chapters, render_images
-from workflow.layout import build_kids_pdf
-from ai_clients import load_fallback_json
-from workflow.references import generate_reference_images
+from typing import Optional
+from workflow.user_input import (
+    UserConfig, normalize_user_config, request_key, validate_user_config, ValidationError, PAINTINGS,
+)
+from workflow.workspace import Workspace, publish
 
 OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "output"))
 FALLBACK_JSON = Path("fallback/fallback_data.json")
 
-async def generate_book_service(req) -> str:
-    print("\n--- [START] Received new book generation request ---")
+
+def validate_request(req) -> None:
+    """Reject bad requests up front, before a job is queued."""
+    if req.fallback:
+        return
+    if req.painting_id not in PAINTINGS:
+        raise HTTPException(status_code=400, detail="Invalid painting_id")
+    try:
+        validate_user_config(UserConfig(req.painting_id, req.child_name, req.child_age, req.family_value))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def request_key_for(req) -> Optional[str]:
+    """Coalescing key for a request; fallback books are cheap and never shared."""
+    if req.fallback:
+        return None
+    return request_key(UserConfig(req.painting_id, req.child_name, req.child_age, req.family_value))
+
+
+def result_exists(job) -> bool:
+    """A cached book is only reused while its PDF is still on disk."""
+    return bool(job.result_url) and (OUTPUT_DIR / Path(job.result_url).name).is_file()
+
+
+def preview_url(job_id: str, index: int, size: str) -> str:
+    return f"/api/jobs/{job_id}/pages/{index}/{size}"
+
+
+def generate_book(job, report) -> str:
+    """
+    Runs the book pipeline for one job on a worker thread.
+    `report(stage, progress)` is called as each stage starts; returns the download URL.
+    """
+    # Deferred so the API starts without loading the pipeline (PIL, reportlab, httpx, rich).
+    from ai_clients import load_fallback_json
+    from workflow.pdf_pool import pdf_pool
+    from workflow.pipeline import run_book
+    from workflow.previews import make_previews
+
+    req = job.request
+    print(f"\n--- [START] Job {job.id}: new book generation request ---")
     print(f"Request details: {req}")
 
     try:
         if req.fallback:
-            # ... (la logique du fallback reste la même) ...
-            return f"/download/{pdf_path.name}"
-
-        if req.painting_id not in PAINTINGS:
-            raise HTTPException(status_code=400, detail="Invalid painting_id")
+            report("fallback", 0.5)
+            data = load_fallback_json(FALLBACK_JSON)
+            ws = Workspace.create(OUTPUT_DIR, job.id)
+            images = [Path(p) for p in data["images"]]
+            for index, path in enumerate(images):
+                try:
+                    make_previews(path, ws.previews_dir, index)
+                except Exception as e:
+                    print(f"--- [WARN] Could not make a preview of page {index}: {e}")
+            pdf_pool.render(data["title"], data["chapters"], images, ws.pdf_path)
+            pdf_path = publish(ws.pdf_path, OUTPUT_DIR / f"book_fallback_{job.id}.pdf")
+            return f"/api/download/{pdf_path.name}"
 
-        cfg = UserConfig(req.painting_id, req.child_name, req.child_age, req.family_value)
+        cfg = normalize_user_config(UserConfig(req.painting_id, req.child_name, req.child_age, req.family_value))
         validate_user_config(cfg)
         print(f"--- [OK] User config validated for child: {cfg.child_name}")
 
-        painting_name = PAINTINGS[cfg.painting_id]
-        
-        print("--- [STEP 1/6] Extracting art features...")
-        art = extract_art_features(painting_name)
-        print("--- [OK] Art features extracted.")
-
-        print("--- [STEP 2/6] Creating story outline...")
-        # On récupère maintenant l'outline qui inclut le book_title
-        outline = create_outline(cfg.child_name, cfg.child_age, cfg.family_value, painting_name)
-        book_title_from_outline = outline.get("book_title", f"{cfg.child_name}'s Amazing Story") # Récupère le titre généré
-        print(f"--- [OK] Story outline created. Book Title: '{book_title_from_outline}'")
-
-        print("--- [STEP 3/6] Writing full story...")
-        chapters = write_full_story(outline, cfg.child_age, art)
-        print(f"--- [OK] Full story with {len(chapters)} chapters written.")
-
-        print("--- [STEP 4/6] Generating reference images (hero, props, env)...")
-        refs_dir = OUTPUT_DIR / "references" / cfg.child_name.lower()
-        refs = generate_reference_images(cfg.child_name, art, refs_dir)
-        print("--- [OK] Reference images generated.")
-
-        print("--- [STEP 5/6] Generating chapter images...")
-        prompts = prompts_for_chapters(cfg.child_name, art, outline)
-        img_dir = OUTPUT_DIR / "images" / cfg.child_name.lower()
-        images = render_images(prompts, img_dir, refs=refs)
-        print(f"--- [OK] {len(images)} chapter images generated.")
-        
-        if not images or len(images) < len(chapters) + 2: # Need cover, chapters, back
-             raise ValueError("Image generation failed to produce enough images for the book.")
-
-        print("--- [STEP 6/6] Assembling the PDF book...")
-        pdf_path = OUTPUT_DIR / f"book_{cfg.child_name}_api.pdf"
-        build_kids_pdf(book_title_from_outline, chapters, images, pdf_path)
-        print(f"--- [SUCCESS] PDF book with title '{book_title_from_outline}' created at: {pdf_path.name}")
-
-        
-        return f"/download/{pdf_path.name}"
+        def on_event(stage: str, status: str, info: dict):
+            if status == "started":
+                print(f"--- [STAGE] {stage} started")
+                report(stage, info["finished"] / info["total"])
+            else:
+                print(f"--- [OK] {stage} finished in {info['seconds']:.1f}s ({info['finished']}/{info['total']})")
+
+        # Each job writes into its own workspace; only the finished PDF is published.
+        ws = Workspace.create(OUTPUT_DIR, job.id)
+
+        def on_page(index: int, path: Path):
+            try:
+                make_previews(path, ws.previews_dir, index)
+                urls = {"thumbnail_url": preview_url(job.id, index, "thumb"),
+                        "preview_url": preview_url(job.id, index, "medium")}
+            except Exception as e:
+                print(f"--- [WARN] Could not make a preview of page {index}: {e}")
+                urls = {"thumbnail_url": None, "preview_url": None}
+            job.emit("page", index=index, **urls)
+
+        result = run_book(
+            cfg,
+            refs_dir=ws.refs_dir,
+            images_dir=ws.images_dir,
+            pdf_path=ws.pdf_path,
+            on_event=on_event,
+            on_page=on_page,
+            mode="process",  # keep reportlab/Pillow composition out of the API process
+        )
+        pdf_path = publish(ws.pdf_path, OUTPUT_DIR / f"book_{cfg.child_name}_{job.id}.pdf")
+        print(f"--- [SUCCESS] PDF book with title '{result['title']}' created at: {pdf_path.name}")
+
+        return f"/api/download/{pdf_path.name}"
 
     except Exception as e:
-        print(f"\n\n--- [CRITICAL ERROR] An exception occurred during book generation! ---")
+        print(f"\n\n--- [CRITICAL ERROR] Job {job.id}: an exception occurred during book generation! ---")
         print(f"Error Type: {type(e)}")
         print(f"Error Details: {e}")
-        import traceback
-        traceback.print_exc()
         print("-------------------------------------------------------------------\n\n")
-        # Renvoyer une erreur claire au frontend
-        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
\ No newline at end of file
+        raise
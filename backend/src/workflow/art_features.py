@@ -1,13 +1,19 @@
-from dataclasses import dataclass, field
-from typing import List, Optional
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
 from pathlib import Path
+import os
+import json
 import logging
-from ai_clients import generate_json, generate_image_from_text
+import threading
+from ai_clients import generate_json, generate_image_from_text, TEXT_MODEL
+from workflow.cache import atomic_write_bytes
+from workflow.user_input import PAINTINGS
+from workflow.metrics import FALLBACKS
 
 logger = logging.getLogger(__name__)
 
-REF_DIR = Path("refs")
-REF_DIR.mkdir(exist_ok=True)
+REF_DIR = Path("refs")  # created on first download, not at import
+ART_FEATURES_CACHE = Path(os.getenv("ART_FEATURES_CACHE", "output/cache/art_features.json"))
 
 @dataclass
 class ArtFeatures:
@@ -33,6 +39,9 @@ FALLBACK_FEATURES = ArtFeatures(
     background_prompt="Starry night, dreamy, warm colors, kid-friendly illustration"
 )
 
+# Fields that depend only on the painting; the reference paths are attached per call.
+CACHED_FIELDS = ("colors", "mood", "style", "brushwork", "hero_prompt", "prop_prompts", "background_prompt")
+
 SYS_PROMPT = (
     "You are an expert art critic. "
     "Extract artistic features of the painting and return strictly as JSON "
@@ -51,20 +60,24 @@ def normalize_features(raw: dict) -> ArtFeatures:
         background_prompt=raw.get("background_prompt", FALLBACK_FEATURES.background_prompt)
     )
 
-def extract_art_features(painting_name: str) -> ArtFeatures:
+def _features_from_llm(painting_name: str) -> Optional[ArtFeatures]:
+    """Ask the text model for the painting's features; None when it fails."""
     user = f"Analyze the painting '{painting_name}' and extract its artistic features."
     raw = generate_json(SYS_PROMPT, user)
 
     if not raw:
         logger.warning("Falling back to default art features for %s", painting_name)
-        art = FALLBACK_FEATURES
-    else:
-        try:
-            art = normalize_features(raw)
-        except Exception as e:
-            logger.error("Error normalizing features for %s: %s", painting_name, e)
-            art = FALLBACK_FEATURES
+        FALLBACKS.inc(kind="art_features")
+        return None
+    try:
+        return normalize_features(raw)
+    except Exception as e:
+        logger.error("Error normalizing features for %s: %s", painting_name, e)
+        FALLBACKS.inc(kind="art_features")
+        return None
+
 
+def _attach_reference_images(art: ArtFeatures) -> ArtFeatures:
     # Generate reference images if missing
     if not art.hero_path:
         art.hero_path = REF_DIR / "hero.png"
@@ -86,3 +99,67 @@ def extract_art_features(painting_name: str) -> ArtFeatures:
 
     return art
 
+
+def extract_art_features(painting_name: str) -> ArtFeatures:
+    art = _features_from_llm(painting_name) or replace(FALLBACK_FEATURES, prop_paths=[])
+    return _attach_reference_images(art)
+
+# -------------------- Per-painting cache --------------------
+
+_memo: Dict[str, dict] = {}
+_memo_lock = threading.Lock()
+
+
+def _cache_key(painting_id: str) -> str:
+    return f"{painting_id}@{TEXT_MODEL}"
+
+
+def _load_persisted() -> Dict[str, dict]:
+    try:
+        with open(ART_FEATURES_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _persist(key: str, raw: dict) -> None:
+    with _memo_lock:
+        data = _load_persisted()
+        data[key] = raw
+        atomic_write_bytes(ART_FEATURES_CACHE, json.dumps(data, indent=2).encode("utf-8"))
+
+
+def get_art_features(painting_id: str) -> ArtFeatures:
+    """
+    Art features for a catalog painting, keyed by painting ID and text model.
+    Served from memory or the on-disk cache; the LLM is only asked on a miss,
+    and fallback features are never cached.
+    """
+    key = _cache_key(painting_id)
+    with _memo_lock:
+        raw = _memo.get(key)
+        if raw is None:
+            raw = _load_persisted().get(key)
+            if raw is not None:
+                _memo[key] = raw
+
+    if raw is None:
+        art = _features_from_llm(PAINTINGS[painting_id])
+        if art is None:
+            return _attach_reference_images(replace(FALLBACK_FEATURES, prop_paths=[]))
+        raw = {k: getattr(art, k) for k in CACHED_FIELDS}
+        _persist(key, raw)
+        with _memo_lock:
+            _memo[key] = raw
+
+    return _attach_reference_images(normalize_features(raw))
+
+
+def warm_art_features(painting_ids: Optional[List[str]] = None) -> Dict[str, bool]:
+    """Fill the cache for every catalog painting; returns which ones are now cached."""
+    warmed = {}
+    for painting_id in painting_ids or list(PAINTINGS):
+        get_art_features(painting_id)
+        with _memo_lock:
+            warmed[painting_id] = _cache_key(painting_id) in _memo
+    return warmed
@@ -0,0 +1,147 @@
+import os
+import csv
+import json
+import time
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from workflow.user_input import (
+    UserConfig, ValidationError, normalize_user_config, request_key, validate_user_config,
+)
+from workflow.art_features import get_art_features
+from workflow.references import warm_shared_references
+from workflow.pipeline import run_book
+from workflow.workspace import Workspace, publish
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# on_book(cfg, result, pdf_path) after each successful book, e.g. to log the session.
+BookCallback = Callable[[UserConfig, Dict[str, Any], Path], None]
+
+
+def load_batch(path: Path) -> List[UserConfig]:
+    """
+    Read book configs from a .jsonl or .csv file with painting_id, child_name,
+    child_age and (optional) family_value fields, normalized and validated.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    configs = []
+    for n, row in enumerate(rows, start=1):
+        try:
+            cfg = normalize_user_config(UserConfig(
+                str(row["painting_id"]), str(row["child_name"]), int(row["child_age"]),
+                str(row.get("family_value") or ""),
+            ))
+            validate_user_config(cfg)
+        except (KeyError, ValueError, ValidationError) as e:
+            raise ValueError(f"{path}: invalid entry #{n}: {e}") from e
+        configs.append(cfg)
+    return configs
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished items, so a restarted batch skips them."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry.get("status") == "ok":
+                        self.done[entry["key"]] = entry
+
+    def record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            if entry["status"] == "ok":
+                self.done[entry["key"]] = entry
+
+
+def _build_book(cfg: UserConfig, key: str, output_dir: Path) -> Tuple[Path, Dict[str, Any]]:
+    ws = Workspace.create(output_dir, f"batch-{key[:16]}")
+    with ws.hold():  # the API's collector may share output_dir
+        result = run_book(cfg, refs_dir=ws.refs_dir, images_dir=ws.images_dir, pdf_path=ws.pdf_path)
+        pdf_path = publish(ws.pdf_path, output_dir / f"book_{cfg.child_name}_{key[:8]}.pdf")
+    return pdf_path, result
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_batch(configs: List[UserConfig], output_dir: Path, checkpoint: Checkpoint,
+              workers: int = BATCH_WORKERS, on_book: Optional[BookCallback] = None,
+              on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Build many books on a shared worker pool. Identical configs are built once,
+    items already in the checkpoint are skipped, and art features plus the
+    child-independent references are prepared once per painting up front.
+    Returns a summary report with throughput and per-book latency.
+    """
+    unique: Dict[str, UserConfig] = {}
+    for cfg in configs:
+        unique.setdefault(request_key(cfg), cfg)
+    todo = {key: cfg for key, cfg in unique.items() if key not in checkpoint.done}
+
+    start = time.perf_counter()
+    for painting_id in sorted({cfg.painting_id for cfg in todo.values()}):
+        warm_shared_references(get_art_features(painting_id))
+
+    def build(key: str, cfg: UserConfig) -> Dict[str, Any]:
+        book_start = time.perf_counter()
+        entry = {"key": key, "child_name": cfg.child_name, "painting_id": cfg.painting_id}
+        try:
+            pdf_path, result = _build_book(cfg, key, output_dir)
+            if on_book:
+                on_book(cfg, result, pdf_path)
+            entry.update(status="ok", pdf=str(pdf_path))
+        except Exception as e:
+            entry.update(status="failed", error=str(e))
+        entry["seconds"] = round(time.perf_counter() - book_start, 3)
+        checkpoint.record(entry)
+        return entry
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch") as pool:
+        futures = [pool.submit(build, key, cfg) for key, cfg in todo.items()]
+        for future in as_completed(futures):
+            entries.append(future.result())
+            if on_progress:
+                on_progress(entries[-1])
+    wall = time.perf_counter() - start
+
+    latencies = [e["seconds"] for e in entries if e["status"] == "ok"]
+    report = {
+        "items": len(configs),
+        "unique": len(unique),
+        "skipped": len(unique) - len(todo),
+        "succeeded": len(latencies),
+        "failed": [{"key": e["key"], "child_name": e["child_name"], "error": e["error"]}
+                   for e in entries if e["status"] == "failed"],
+        "wall_seconds": round(wall, 3),
+        "books_per_hour": round(len(latencies) * 3600 / wall, 2) if wall > 0 else 0.0,
+        "latency_seconds": {
+            "mean": round(statistics.fmean(latencies), 3),
+            "p50": _percentile(latencies, 0.5),
+            "p90": _percentile(latencies, 0.9),
+            "max": max(latencies),
+        } if latencies else None,
+    }
+    return report
@@ -0,0 +1,67 @@
+import time
+import threading
+from typing import Any, Dict
+from workflow.metrics import UPSTREAM_BREAKER_STATE
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream endpoint whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. Then a single trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        UPSTREAM_BREAKER_STATE.set(0, endpoint=name)
+
+    def _set(self, state: str):
+        self.state = state
+        UPSTREAM_BREAKER_STATE.set(_STATE_VALUES[state], endpoint=self.name)
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self._set(HALF_OPEN)
+            if self.state == OPEN or (self.state == HALF_OPEN and self._trial_in_flight):
+                raise CircuitOpenError(f"Upstream endpoint '{self.name}' is unavailable; failing fast.")
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            self._set(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                self._set(OPEN)
+
+    def release(self):
+        """End a call that proved nothing about upstream health (e.g. a 4xx)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = self.reset_timeout - (time.time() - self.opened_at) if self.state == OPEN else 0.0
+            return {"state": self.state, "failures": self.failures, "retry_in": round(max(0.0, retry_in), 1)}
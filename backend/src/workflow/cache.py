@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def content_key(*parts: Any) -> str:
+    """Stable SHA-256 key for any JSON-serializable inputs."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _iter_files(root: Path, keep: Iterable[Path] = ()) -> Iterable[Path]:
+    keep = [k.resolve() for k in keep]
+    for path in root.rglob("*"):
+        if not path.is_file():
+            continue
+        resolved = path.resolve()
+        if any(resolved == k or k in resolved.parents for k in keep):
+            continue
+        yield path
+
+
+def _usage(root: Path) -> int:
+    """Total size in bytes of the files under `root`."""
+    total = 0
+    for path in _iter_files(root):
+        try:
+            total += path.stat().st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def evict_lru(root: Path, max_bytes: Optional[int] = None, max_age: Optional[float] = None,
+              keep: Iterable[Path] = ()) -> Dict[str, int]:
+    """
+    Delete files under `root` older than `max_age` seconds, then the least recently
+    used ones (by mtime) until the total is at most `max_bytes`. Paths under `keep`
+    are never touched. Returns counts of removed files and remaining bytes.
+    """
+    if not root.exists():
+        return {"removed": 0, "bytes": 0}
+
+    now = time.time()
+    entries = []
+    removed = 0
+    for path in _iter_files(root, keep):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if max_age is not None and now - st.st_mtime > max_age:
+            path.unlink(missing_ok=True)
+            removed += 1
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if max_bytes is not None and total > max_bytes:
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            path.unlink(missing_ok=True)
+            removed += 1
+            total -= size
+            if total <= max_bytes:
+                break
+
+    return {"removed": removed, "bytes": total}
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class ResponseCache:
+    """
+    Content-addressed JSON cache on disk with TTL expiry and size-bounded LRU eviction.
+    Entries live in `root/<key[:2]>/<key>.json`; a hit refreshes the file's mtime.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, ttl: Optional[float] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl:
+            size = _size(path)
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self.misses += 1
+                if self._bytes is not None:
+                    self._bytes = max(0, self._bytes - size)
+            return None
+
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return entry["value"]
+
+    def put(self, key: str, value: Any) -> None:
+        data = json.dumps({"created": time.time(), "value": value}).encode("utf-8")
+        path = self._path(key)
+        replaced = _size(path)
+        atomic_write_bytes(path, data)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = _usage(self.root)
+            else:
+                self._bytes += len(data) - replaced
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self) -> None:
+        result = evict_lru(self.root, max_bytes=self.max_bytes, max_age=self.ttl)
+        with self._lock:
+            self.evictions += result["removed"]
+            self._bytes = result["bytes"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
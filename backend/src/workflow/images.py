@@ -1,11 +1,16 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-from ai_clients import generate_image_from_text, generate_image_from_images
+from typing import Callable, List, Dict, Optional
+from ai_clients import generate_image_from_text, generate_image_from_images, prepare_reference_uploads
 from PIL import Image
 from rich.console import Console
+from workflow.metrics import FALLBACKS
 
 console = Console()
 
+IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+
 NEGATIVE_PROMPT = "--- DO NOT include any text, letters, numbers, words, or signatures in the image."
 
 def prompts_for_chapters(child_name: str, art, outline: Dict, refs: dict = None) -> List[str]:
@@ -60,15 +65,45 @@ def prompts_for_chapters(child_name: str, art, outline: Dict, refs: dict = None)
     return [cover_prompt] + chapter_prompts + [back_cover_prompt]
 
 
+def _placeholder(out_path: Path) -> Path:
+    FALLBACKS.inc(kind="page_placeholder")
+    Image.new("RGB", (1024, 1024), (240, 240, 240)).save(out_path)
+    return out_path
+
+
+def _render_page(i: int, total: int, prompt: str, out_path: Path, ref_images: list) -> Path:
+    """Renders a single page, falling back to a gray placeholder on any failure."""
+    try:
+        if ref_images:
+            console.print(f"🖌️ Generating page image {i}/{total} using I2I with {len(ref_images)} references…")
+            img_path = generate_image_from_images(prompt, ref_images, out_path)
+        else:
+            console.print(f"🖌️ Generating page image {i}/{total} from text prompt…")
+            img_path = generate_image_from_text(prompt, out_path)
+
+        if not img_path or not Path(img_path).exists():
+            console.print(f"⚠️ Failed to generate page {i}, creating placeholder…")
+            return _placeholder(out_path)
+
+        return Path(img_path)
+
+    except Exception as e:
+        console.print(f"[red]Error generating page image {i}: {e}[/red]")
+        return _placeholder(out_path)
+
+
 def render_images(
     prompts: List[str],
     out_dir: Path,
-    refs: Optional[Dict[str, Path]] = None
+    refs: Optional[Dict[str, Path]] = None,
+    max_workers: int = IMAGE_CONCURRENCY,
+    on_page: Optional[Callable[[int, Path], None]] = None,
 ) -> List[Path]:
     """
     Renders images for all provided prompts (cover, chapters, back cover).
+    Up to `max_workers` pages are generated at once; the returned list keeps prompt order.
+    `on_page(index, path)` is called (0-based index) as soon as each page is ready.
     """
-    paths = []
     out_dir.mkdir(parents=True, exist_ok=True)
 
     ref_images = []
@@ -85,26 +120,22 @@ def render_images(
         if env_ref and env_ref.exists():
             ref_images.append(env_ref)
 
-    for i, prompt in enumerate(prompts, start=1):
-        out_path = out_dir / f"scene_{i:02d}.png"
-        try:
-            if ref_images:
-                console.print(f"🖌️ Generating page image {i}/{len(prompts)} using I2I with {len(ref_images)} references…")
-                img_path = generate_image_from_images(prompt, ref_images, out_path)
-            else:
-                console.print(f"🖌️ Generating page image {i}/{len(prompts)} from text prompt…")
-                img_path = generate_image_from_text(prompt, out_path)
-
-            if not img_path or not Path(img_path).exists():
-                console.print(f"⚠️ Failed to generate page {i}, creating placeholder…")
-                Image.new("RGB", (1024, 1024), (240, 240, 240)).save(out_path)
-                img_path = out_path
-
-            paths.append(Path(img_path))
-
-        except Exception as e:
-            console.print(f"[red]Error generating page image {i}: {e}[/red]")
-            Image.new("RGB", (1024, 1024), (240, 240, 240)).save(out_path)
-            paths.append(out_path)
-
-    return paths
\ No newline at end of file
+    # Downscale and encode the references once; every page upload reuses these bytes.
+    ref_images = prepare_reference_uploads(ref_images) if ref_images else []
+
+    jobs = [
+        (i, len(prompts), prompt, out_dir / f"scene_{i:02d}.png", ref_images)
+        for i, prompt in enumerate(prompts, start=1)
+    ]
+
+    def render(job) -> Path:
+        path = _render_page(*job)
+        if on_page:
+            on_page(job[0] - 1, path)
+        return path
+
+    if max_workers <= 1:
+        return [render(job) for job in jobs]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page-render") as pool:
+        return list(pool.map(render, jobs))
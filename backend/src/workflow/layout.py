@@ -1,13 +1,103 @@
+import io
+import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Union
+from PIL import Image
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from textwrap import wrap
+from reportlab import rl_config
+from workflow.cache import atomic_write_bytes
+from workflow.text_layout import TEXT_LAYOUT_MODE, break_lines, text_width, word_width
+
+# Embed image and page streams as binary. ASCII85 only matters for 7-bit
+# transports; in pure Python it dominated page assembly and grew files by 25%.
+rl_config.useA85 = 0
 
 # -------------------- Page Size --------------------
 PAGE_WIDTH = PAGE_HEIGHT = 8.5 * inch  # square page for kids book
+PAGE_INCHES = 8.5
+
+# -------------------- Image Profiles --------------------
+
+@dataclass(frozen=True)
+class ImageProfile:
+    dpi: int
+    format: str = "JPEG"  # "JPEG" or "PNG"
+    quality: int = 85
+
+
+IMAGE_PROFILES = {
+    "screen": ImageProfile(dpi=120, format="JPEG", quality=80),
+    "print": ImageProfile(dpi=300, format="JPEG", quality=92),
+}
+PDF_IMAGE_PROFILE = os.getenv("PDF_IMAGE_PROFILE", "screen")
+if PDF_IMAGE_PROFILE not in IMAGE_PROFILES:  # fail at startup, not after the images are paid for
+    raise ValueError(f"Unknown PDF_IMAGE_PROFILE {PDF_IMAGE_PROFILE!r}; expected one of {sorted(IMAGE_PROFILES)}")
+
+
+def _has_visible_alpha(img: Image.Image) -> bool:
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        alpha = img.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+
+def _resolve_profile(profile: Union[str, ImageProfile]) -> ImageProfile:
+    if isinstance(profile, str):
+        if profile not in IMAGE_PROFILES:
+            raise ValueError(f"Unknown image profile {profile!r}; expected one of {sorted(IMAGE_PROFILES)}")
+        profile = IMAGE_PROFILES[profile]
+    return profile
+
+
+def _encode_page_image(path: Path, profile: ImageProfile) -> bytes:
+    target_px = int(PAGE_INCHES * profile.dpi)
+
+    with Image.open(path) as img:
+        img.load()
+        if max(img.size) > target_px:
+            img.thumbnail((target_px, target_px), Image.Resampling.LANCZOS)
+
+        keep_alpha = profile.format == "PNG" and _has_visible_alpha(img)
+        if keep_alpha:
+            img = img.convert("RGBA")
+        elif _has_visible_alpha(img):
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img.convert("RGBA"), mask=img.convert("RGBA").getchannel("A"))
+            img = background
+        else:
+            img = img.convert("RGB")
+
+        buf = io.BytesIO()
+        if profile.format == "JPEG":
+            img.save(buf, format="JPEG", quality=profile.quality, optimize=True, progressive=True)
+        else:
+            img.save(buf, format=profile.format, optimize=True)
+    return buf.getvalue()
+
+
+def prepare_page_image(path: Path, profile: Union[str, ImageProfile] = PDF_IMAGE_PROFILE) -> ImageReader:
+    """
+    Downsample a page image to the profile's DPI for a full-bleed page and re-encode it.
+    Unused alpha is dropped; used alpha is flattened onto white for JPEG. Never upscales.
+    JPEG output is embedded in the PDF as-is by reportlab, without another encode.
+    """
+    return ImageReader(io.BytesIO(_encode_page_image(path, _resolve_profile(profile))))
+
+
+def prepare_page_file(path: Path, dest_dir: Path, profile: Union[str, ImageProfile] = PDF_IMAGE_PROFILE) -> Path:
+    """
+    prepare_page_image, written to `dest_dir` (atomically) for a later
+    build_kids_pdf(..., prepared=True), e.g. from another process.
+    """
+    profile = _resolve_profile(profile)
+    dest = dest_dir / f"{path.stem}.{profile.format.lower()}"
+    atomic_write_bytes(dest, _encode_page_image(path, profile))
+    return dest
 
 # -------------------- Utilities --------------------
 
@@ -24,7 +114,8 @@ def draw_cover_title_top_box(c: "canvas.Canvas", title: str, page_width: float,
 
     c.setFont(font_name, font_size)
     total_text_height = len(lines) * font_size + (len(lines) - 1) * line_spacing
-    max_line_width = max(c.stringWidth(line, font_name, font_size) for line in lines)
+    line_widths = [text_width(line, font_name, font_size) for line in lines]
+    max_line_width = max(line_widths)
     box_width = max_line_width + 2 * padding
     box_height = total_text_height + 2 * padding
 
@@ -39,8 +130,7 @@ def draw_cover_title_top_box(c: "canvas.Canvas", title: str, page_width: float,
     c.restoreState()
 
     y_text_start = box_y + box_height - padding - font_size
-    for line in lines:
-        line_width = c.stringWidth(line, font_name, font_size)
+    for line, line_width in zip(lines, line_widths):
         x_text = x_center - line_width / 2
         c.drawString(x_text, y_text_start, line)
         y_text_start -= font_size + line_spacing
@@ -54,23 +144,19 @@ def draw_page_number(c: "canvas.Canvas", page_num: int, page_width: float, page_
     y = margin_bottom
     c.drawString(x, y, text)
 
+def layout_text_page(text: str, page_width: float, font_name="Times-Roman", font_size=24,
+                     side_margin=inch, mode: str = TEXT_LAYOUT_MODE) -> List[str]:
+    """Line wrapping for a text page ("optimal" or "greedy"); pure computation, no canvas needed."""
+    return break_lines(text, page_width - 2*side_margin, font_name, font_size, mode)
+
 def draw_text_page(c: "canvas.Canvas", text: str, page_width: float, page_height: float,
-                   font_name="Times-Roman", font_size=24, line_spacing=10, side_margin=inch):
+                   font_name="Times-Roman", font_size=24, line_spacing=10, side_margin=inch,
+                   lines: Optional[List[str]] = None):
     c.setFont(font_name, font_size)
     c.setFillColor(colors.black)
 
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + (" " if current_line else "") + word
-        if c.stringWidth(test_line, font_name, font_size) <= (page_width - 2*side_margin):
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
+    if lines is None:
+        lines = layout_text_page(text, page_width, font_name, font_size, side_margin)
 
     total_text_height = len(lines) * font_size + (len(lines) - 1) * line_spacing
     y_start = (page_height + total_text_height)/2 - font_size
@@ -83,48 +169,113 @@ def draw_text_page(c: "canvas.Canvas", text: str, page_width: float, page_height
             if len(words_in_line) == 1:
                 c.drawString(side_margin, y_start, line)
             else:
-                line_width = c.stringWidth(line, font_name, font_size)
-                space_needed = page_width - 2*side_margin - sum(c.stringWidth(w, font_name, font_size) for w in words_in_line)
+                widths = [word_width(w, font_name, font_size) for w in words_in_line]
+                space_needed = page_width - 2*side_margin - sum(widths)
                 extra_space = space_needed / (len(words_in_line)-1)
                 x = side_margin
-                for w in words_in_line:
+                for w, width in zip(words_in_line, widths):
                     c.drawString(x, y_start, w)
-                    x += c.stringWidth(w, font_name, font_size) + extra_space
+                    x += width + extra_space
         y_start -= font_size + line_spacing
 
 # -------------------- Main PDF Builder --------------------
 
-def build_kids_pdf(title: str, chapters: List[str], images: List[Path], output_pdf: Path):
-    output_pdf.parent.mkdir(parents=True, exist_ok=True)
-    c = canvas.Canvas(str(output_pdf), pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+class StreamingKidsPdf:
+    """
+    Assembles the book while page images are still being generated.
+    Images may arrive in any order from any thread; each is prepared by the thread
+    that delivers it, and pages are drawn in book order as soon as everything
+    before them is available. Text pages are laid out as soon as chapters arrive.
+
+    Image indices follow render_images: 0 is the cover, 1..N the chapters,
+    and the last index the back cover.
+    """
 
-    page_counter = 1
+    def __init__(self, title: str, n_images: int, output_pdf: Path,
+                 profile: Union[str, ImageProfile] = PDF_IMAGE_PROFILE):
+        if n_images < 2:
+            raise ValueError("A book needs at least a cover and a back cover image.")
+        output_pdf.parent.mkdir(parents=True, exist_ok=True)
+        self.title = title
+        self.n_images = n_images
+        self.output_pdf = output_pdf
+        self.profile = profile
+        self._canvas = canvas.Canvas(str(output_pdf), pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+        self._images: Dict[int, ImageReader] = {}
+        self._chapters: Optional[List[str]] = None
+        self._text_lines: List[List[str]] = []
+        self._next = 0
+        self._page_counter = 1
+        self._lock = threading.Lock()
 
-    # Cover page
-    cover_img = ImageReader(str(images[0]))
-    c.drawImage(cover_img, 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT, preserveAspectRatio=False, mask='auto')
-    draw_cover_title_top_box(c, title, PAGE_WIDTH, PAGE_HEIGHT)
-    c.showPage()  # cover: no page number
+    def set_chapters(self, chapters: List[str]):
+        # Extra chapters without an illustration are dropped, like zip() in the old builder.
+        chapters = chapters[: self.n_images - 2]
+        text_lines = [layout_text_page(text, PAGE_WIDTH) for text in chapters]
+        with self._lock:
+            self._chapters = chapters
+            self._text_lines = text_lines
+            self._drain()
 
-    # Story pages
-    for i, (text, img_path) in enumerate(zip(chapters, images[1:])):
-        img = ImageReader(str(img_path))
-        c.drawImage(img, 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT, preserveAspectRatio=False, mask='auto')
-        draw_page_number(c, page_counter, PAGE_WIDTH, PAGE_HEIGHT)
-        page_counter += 1
-        c.showPage()
+    def add_image(self, index: int, path: Path, prepared: bool = False):
+        """Place page `index`; `prepared` images (from prepare_page_file) are embedded as they are."""
+        reader = ImageReader(str(path)) if prepared else prepare_page_image(path, self.profile)
+        with self._lock:
+            self._images[index] = reader
+            self._drain()
+
+    def _draw_image(self, index: int):
+        c = self._canvas
+        c.drawImage(self._images.pop(index), 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT,
+                    preserveAspectRatio=False, mask='auto')
+
+    def _drain(self):
+        c = self._canvas
+        back = self.n_images - 1
+        while self._next <= back and self._next in self._images:
+            index = self._next
+            if index == 0:
+                # Cover page
+                self._draw_image(0)
+                draw_cover_title_top_box(c, self.title, PAGE_WIDTH, PAGE_HEIGHT)
+                c.showPage()  # cover: no page number
+            elif index == back:
+                if self._chapters is None:
+                    return
+                # Back cover
+                self._draw_image(back)
+                c.showPage()  # back cover: no page number
+            else:
+                if self._chapters is None:
+                    return
+                if index <= len(self._chapters):
+                    # Story pages
+                    self._draw_image(index)
+                    draw_page_number(c, self._page_counter, PAGE_WIDTH, PAGE_HEIGHT)
+                    self._page_counter += 1
+                    c.showPage()
 
-        draw_text_page(c, text, PAGE_WIDTH, PAGE_HEIGHT)
-        draw_page_number(c, page_counter, PAGE_WIDTH, PAGE_HEIGHT)
-        page_counter += 1
-        c.showPage()
+                    text = self._chapters[index - 1]
+                    draw_text_page(c, text, PAGE_WIDTH, PAGE_HEIGHT, lines=self._text_lines[index - 1])
+                    draw_page_number(c, self._page_counter, PAGE_WIDTH, PAGE_HEIGHT)
+                    self._page_counter += 1
+                    c.showPage()
+                else:
+                    self._images.pop(index)  # illustration without a chapter
+            self._next += 1
 
-    # Back cover
-    back_img = ImageReader(str(images[-1]))
-    c.drawImage(back_img, 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT, preserveAspectRatio=False, mask='auto')
-    c.showPage()  # back cover: no page number
+    def finish(self) -> Path:
+        with self._lock:
+            if self._chapters is None or self._next < self.n_images:
+                raise ValueError(f"Book is incomplete: {self._next}/{self.n_images} images placed.")
+            self._canvas.save()
+        return self.output_pdf
 
-    c.save()
-    return output_pdf
 
- 
\ No newline at end of file
+def build_kids_pdf(title: str, chapters: List[str], images: List[Path], output_pdf: Path,
+                   profile: Union[str, ImageProfile] = PDF_IMAGE_PROFILE, prepared: bool = False):
+    book = StreamingKidsPdf(title, len(images), output_pdf, profile)
+    book.set_chapters(chapters)
+    for i, img_path in enumerate(images):
+        book.add_image(i, img_path, prepared)
+    return book.finish()
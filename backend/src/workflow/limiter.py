@@ -0,0 +1,248 @@
+# Adaptive (AIMD) concurrency limits for upstream API calls. Each budget grows
+# by about one slot per window of healthy calls and halves on throttling, and a
+# Retry-After pauses new calls. Budgets can be shared by several worker
+# processes through a file-locked JSON state file.
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+from workflow.metrics import UPSTREAM_LIMIT, UPSTREAM_THROTTLED
+
+THROTTLE_STATUSES = {429}
+OVERLOAD_STATUSES = {502, 503, 504}
+# Cross-process waiters cannot be woken directly, so they re-check this often.
+SHARED_POLL_INTERVAL = 0.2
+# A process's slots in a shared state file are dropped once it has not touched
+# the file for this long (covers a dead worker whose pid was reused).
+SHARED_STALE_AFTER = 600.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _LocalState:
+    """Budget state for a single process."""
+
+    shared = False
+
+    def __init__(self, initial: Dict[str, Any]):
+        self._state = initial
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self._state
+
+
+class _FileState:
+    """Budget state in a JSON file guarded by flock, shared by every process using it."""
+
+    shared = True
+
+    def __init__(self, path: Path, name: str, initial: Dict[str, Any]):
+        import fcntl  # POSIX only; shared budgets are a deployment option for Linux workers
+
+        self._fcntl = fcntl
+        self.path = path
+        self.name = name
+        self.initial = initial
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @contextmanager
+    def transaction(self):
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            self._fcntl.flock(f, self._fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                data = json.loads(raw) if raw.strip() else {}
+                state = data.setdefault(self.name, dict(self.initial, in_flight={}))
+                seen = state.setdefault("seen", {})
+                now = time.time()
+                seen[str(os.getpid())] = now
+                # Slots held by crashed (or long silent) processes are released here.
+                state["in_flight"] = {pid: n for pid, n in state["in_flight"].items()
+                                      if n > 0 and self._alive(int(pid))
+                                      and now - seen.get(pid, now) < SHARED_STALE_AFTER}
+                state["seen"] = {pid: ts for pid, ts in seen.items() if pid in state["in_flight"]
+                                 or pid == str(os.getpid())}
+                yield state
+                f.seek(0)
+                f.truncate()
+                json.dump(data, f)
+                f.flush()
+            finally:
+                self._fcntl.flock(f, self._fcntl.LOCK_UN)
+
+
+class _Slot:
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.timed_out = False
+
+    def observe(self, status: int, retry_after: Optional[str] = None):
+        self.status = status
+        self.retry_after = parse_retry_after(retry_after)
+
+    def observe_timeout(self):
+        """The upstream did not answer in time: treated like an overload response."""
+        self.timed_out = True
+
+
+class AdaptiveLimiter:
+    """
+    Caps concurrent calls to one upstream budget. The cap starts at `initial`
+    and moves between `min_limit` and `max_limit`. It grows additively while
+    calls succeed within `latency_target` seconds. It shrinks multiplicatively
+    (at most once per `cooldown`) on 429/5xx, errors and slow calls.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 latency_target: float = 60.0, decrease_factor: float = 0.5, cooldown: float = 2.0,
+                 state_path: Optional[Path] = None):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._pid = str(os.getpid())
+        initial_state = {"limit": float(initial or self.max_limit), "paused_until": 0.0, "last_decrease": 0.0}
+        self._state = (_FileState(state_path, name, initial_state) if state_path
+                       else _LocalState(dict(initial_state, in_flight={})))
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._waiters_lock = threading.Lock()
+        UPSTREAM_LIMIT.set(initial_state["limit"], bucket=name)
+
+    # --- state ---
+    def snapshot(self) -> Dict[str, Any]:
+        with self._state.transaction() as s:
+            return {"limit": s["limit"], "in_flight": sum(s["in_flight"].values()),
+                    "paused_for": max(0.0, s["paused_until"] - time.time())}
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a slot and return None, or return how long to wait before retrying (0 = until woken)."""
+        with self._state.transaction() as s:
+            now = time.time()
+            if s["paused_until"] > now:
+                return s["paused_until"] - now
+            if sum(s["in_flight"].values()) >= max(self.min_limit, int(s["limit"])):
+                return SHARED_POLL_INTERVAL if self._state.shared else 0.0
+            s["in_flight"][self._pid] = s["in_flight"].get(self._pid, 0) + 1
+            return None
+
+    def _unacquire(self):
+        """Hand back a slot that was taken for a caller that has gone away."""
+        with self._state.transaction() as s:
+            s["in_flight"][self._pid] = max(0, s["in_flight"].get(self._pid, 0) - 1)
+        self._wake()
+
+    def _release(self, latency: float, slot: _Slot, failed: bool):
+        with self._state.transaction() as s:
+            s["in_flight"][self._pid] = max(0, s["in_flight"].get(self._pid, 0) - 1)
+            now = time.time()
+            throttled = slot.status in THROTTLE_STATUSES
+            if throttled:
+                UPSTREAM_THROTTLED.inc(bucket=self.name)
+                pause = slot.retry_after if slot.retry_after is not None else self.cooldown
+                s["paused_until"] = max(s["paused_until"], now + pause)
+            if (throttled or failed or slot.timed_out or slot.status in OVERLOAD_STATUSES
+                    or latency > self.latency_target):
+                if now - s["last_decrease"] >= self.cooldown:
+                    s["limit"] = max(float(self.min_limit), s["limit"] * self.decrease_factor)
+                    s["last_decrease"] = now
+            elif slot.status is None or slot.status < 400:
+                s["limit"] = min(float(self.max_limit), s["limit"] + 1.0 / max(s["limit"], 1.0))
+            UPSTREAM_LIMIT.set(s["limit"], bucket=self.name)
+        self._wake()
+
+    # --- waiting ---
+    def _wake(self):
+        with self._waiters_lock:
+            waiters, self._waiters = list(self._waiters), deque()
+        for fut in waiters:
+            try:
+                fut.get_loop().call_soon_threadsafe(lambda f=fut: f.done() or f.set_result(None))
+            except RuntimeError:  # its event loop has already closed
+                pass
+
+    async def _try_acquire_async(self) -> Optional[float]:
+        """_try_acquire without blocking the event loop on the shared file lock."""
+        if not self._state.shared:
+            return self._try_acquire()
+        attempt = asyncio.ensure_future(asyncio.to_thread(self._try_acquire))
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            # The thread may still take a slot after we give up; return it.
+            attempt.add_done_callback(lambda f: f.cancelled() or f.result() is not None
+                                      or f.get_loop().run_in_executor(None, self._unacquire))
+            raise
+
+    async def _acquire(self):
+        while True:
+            wait_for = await self._try_acquire_async()
+            if wait_for is None:
+                return
+            fut = asyncio.get_running_loop().create_future()
+            with self._waiters_lock:
+                self._waiters.append(fut)
+            try:
+                # Recheck after registering so a release in between is not missed.
+                if await self._try_acquire_async() is None:
+                    return
+                await asyncio.wait([fut], timeout=wait_for or None)
+            finally:
+                with self._waiters_lock:
+                    if fut in self._waiters:
+                        self._waiters.remove(fut)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one slot for the duration of an upstream call. Report the response
+        with `slot.observe(status, retry_after_header)`, or a timeout with
+        `slot.observe_timeout()`, so the limit can adapt.
+        """
+        await self._acquire()
+        slot = _Slot()
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield slot
+            failed = False
+        finally:
+            if self._state.shared:
+                await asyncio.to_thread(self._release, time.perf_counter() - start, slot, failed)
+            else:
+                self._release(time.perf_counter() - start, slot, failed)
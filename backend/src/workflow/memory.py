@@ -1,23 +1,126 @@
 import json
+import time
+import sqlite3
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    child_name TEXT,
+    painting TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_child ON sessions (child_name, created_at);
+CREATE INDEX IF NOT EXISTS sessions_painting ON sessions (painting, created_at);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created_at);
+"""
+
 
 class MemoryStore:
-    def __init__(self, path: Path):
+    """
+    Session history in SQLite (WAL mode): appends are single-row inserts, so
+    logging cost does not grow with history, and several threads or worker
+    processes can write at once. A legacy memory.json next to the database
+    is imported on first open.
+    """
+
+    def __init__(self, path: Path, legacy_path: Optional[Path] = None, timeout: float = 30.0):
         self.path = path
+        self.legacy_path = legacy_path or path.with_suffix(".json")
+        self.timeout = timeout
+        self._local = threading.local()
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.path.exists():
-            self.save({"sessions": []})
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._import_legacy(conn)
 
-    def load(self) -> Dict[str, Any]:
-        with open(self.path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; explicit BEGIN IMMEDIATE where a transaction spans statements.
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, conn: sqlite3.Connection, session: Dict[str, Any], created_at: float):
+        conn.execute(
+            "INSERT INTO sessions (child_name, painting, created_at, data) VALUES (?, ?, ?, ?)",
+            (session.get("child_name"), session.get("painting"), created_at,
+             json.dumps(session, ensure_ascii=False)),
+        )
 
-    def save(self, data: Dict[str, Any]):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+    def _import_legacy(self, conn: sqlite3.Connection):
+        if not self.legacy_path.exists():
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have imported it while we waited for the lock.
+            if self.legacy_path.exists():
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    sessions = json.load(f).get("sessions", [])
+                created_at = self.legacy_path.stat().st_mtime
+                for session in sessions:
+                    self._insert(conn, session, created_at)
+                self.legacy_path.replace(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
 
     def put_session(self, session: Dict[str, Any]):
-        data = self.load()
-        data["sessions"].append(session)
-        self.save(data)
+        self._insert(self._conn(), session, time.time())
+
+    def query(self, child_name: Optional[str] = None, painting: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Sessions matching every given filter, newest first. Dates are Unix timestamps."""
+        clauses, params = [], []
+        for column, op, value in (("child_name", "=", child_name), ("painting", "=", painting),
+                                  ("created_at", ">=", since), ("created_at", "<", until)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        sql = "SELECT created_at, data FROM sessions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [{"created_at": ts, **json.loads(data)} for ts, data in self._conn().execute(sql, params)]
+
+    def load(self) -> Dict[str, Any]:
+        """Whole history in insertion order, in the legacy memory.json shape."""
+        rows = self._conn().execute("SELECT data FROM sessions ORDER BY id")
+        return {"sessions": [json.loads(data) for (data,) in rows]}
+
+    def compact(self, max_age: Optional[float] = None, keep_per_child: Optional[int] = None) -> int:
+        """
+        Drop sessions older than `max_age` seconds and/or all but the newest
+        `keep_per_child` per child, then checkpoint the WAL and reclaim space.
+        Returns the number of sessions removed.
+        """
+        conn = self._conn()
+        removed = 0
+        if max_age is not None:
+            removed += conn.execute("DELETE FROM sessions WHERE created_at < ?",
+                                    (time.time() - max_age,)).rowcount
+        if keep_per_child is not None:
+            removed += conn.execute(
+                "DELETE FROM sessions WHERE id IN (SELECT id FROM ("
+                " SELECT id, ROW_NUMBER() OVER (PARTITION BY child_name ORDER BY created_at DESC, id DESC) AS n"
+                " FROM sessions) WHERE n > ?)", (keep_per_child,)).rowcount
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
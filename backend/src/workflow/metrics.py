@@ -0,0 +1,195 @@
+# Minimal Prometheus-style metrics: counters, gauges and histograms with labels,
+# rendered in the text exposition format served at /api/metrics.
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _fmt_labels(self, values: LabelValues, extra: str = "") -> str:
+        parts = [f'{label}="{value}"' for label, value in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [f"{self.name}{self._fmt_labels(k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [bucket counts..., +Inf count, sum]
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> float:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-2] if series else 0
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{self._fmt_labels(key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._fmt_labels(key, le)} {series[-2]}")
+            lines.append(f"{self.name}_count{self._fmt_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_sum{self._fmt_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Extra lines produced at scrape time (e.g. cache stats owned elsewhere)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "kidsbook_stage_seconds", "Pipeline stage latency.", ("stage", "outcome")))
+STAGES_IN_FLIGHT = REGISTRY.register(Gauge(
+    "kidsbook_stages_in_flight", "Pipeline stages currently running.", ("stage",)))
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "kidsbook_upstream_seconds", "AI upstream call latency.", ("call", "outcome")))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "kidsbook_upstream_in_flight", "AI upstream calls currently running.", ("call",)))
+UPSTREAM_LIMIT = REGISTRY.register(Gauge(
+    "kidsbook_upstream_concurrency_limit", "Current adaptive concurrency limit per upstream budget.", ("bucket",)))
+UPSTREAM_THROTTLED = REGISTRY.register(Counter(
+    "kidsbook_upstream_throttled_total", "Upstream 429 responses per budget.", ("bucket",)))
+UPSTREAM_BREAKER_STATE = REGISTRY.register(Gauge(
+    "kidsbook_upstream_breaker_state", "Circuit breaker state per endpoint (0 closed, 1 half-open, 2 open).",
+    ("endpoint",)))
+FALLBACKS = REGISTRY.register(Counter(
+    "kidsbook_fallbacks_total", "Fallback or placeholder substitutions.", ("kind",)))
+DOWNLOADED_BYTES = REGISTRY.register(Counter(
+    "kidsbook_downloaded_bytes_total", "Bytes of generated images downloaded from the upstream."))
+JOBS_DEDUPLICATED = REGISTRY.register(Counter(
+    "kidsbook_jobs_deduplicated_total", "Book requests answered by an existing job.", ("source",)))
+GC_REMOVED_BYTES = REGISTRY.register(Counter(
+    "kidsbook_output_gc_removed_bytes_total", "Bytes of expired job output deleted by the collector."))
+UPLOADED_BYTES = REGISTRY.register(Counter(
+    "kidsbook_uploaded_bytes_total", "Bytes of reference images uploaded to the edits endpoint."))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "kidsbook_http_requests_total", "API requests by route and status code.", ("route", "method", "status")))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "kidsbook_http_request_seconds", "API request latency.", ("route", "method")))
+
+
+def track_upstream(call: str, failed: Optional[Callable[[object], bool]] = None):
+    """
+    Decorator recording latency and in-flight count of an async upstream call.
+    The outcome is "error" when it raises or when `failed(result)` is true.
+    """
+    failed = failed or (lambda result: result is None)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            UPSTREAM_IN_FLIGHT.inc(call=call)
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "error" if failed(result) else "ok"
+                return result
+            finally:
+                UPSTREAM_IN_FLIGHT.dec(call=call)
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, call=call, outcome=outcome)
+
+        return wrapper
+
+    return decorator
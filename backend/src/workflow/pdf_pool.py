@@ -0,0 +1,86 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "8"))
+
+
+def _prepare_page(src: str, dest_dir: str) -> str:
+    """Runs in a worker process: resample and re-encode one page image for the PDF."""
+    from workflow.layout import prepare_page_file  # reportlab/Pillow load in the worker only
+
+    return str(prepare_page_file(Path(src), Path(dest_dir)))
+
+
+def _render_pdf(title: str, chapters: List[str], image_paths: List[str], dest: str, prepared: bool) -> str:
+    """Runs in a worker process: compose the PDF next to `dest`, then rename it into place."""
+    from workflow.layout import build_kids_pdf
+
+    dest_path = Path(dest)
+    tmp_path = dest_path.with_name(f".{dest_path.name}.{os.getpid()}.tmp")
+    try:
+        build_kids_pdf(title, chapters, [Path(p) for p in image_paths], tmp_path, prepared=prepared)
+        os.replace(tmp_path, dest_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return str(dest_path)
+
+
+class PdfRenderPool:
+    """
+    Prepares page images and composes PDFs in separate processes, so reportlab
+    and Pillow never hold the API process's GIL. Inputs and outputs are file
+    paths. At most `workers` books render at once and `queue_size` more wait;
+    further callers block until a slot frees up. Worker processes start on
+    first use.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, queue_size: int = PDF_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs threads (uvicorn, job pools) is unsafe.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def prepare(self, src: Path, dest_dir: Path) -> "Future[str]":
+        """
+        Start preparing one page image (the bulk of the PDF's CPU time) as soon
+        as it lands; the future yields the prepared file's path for render().
+        """
+        # Absolute paths: workers keep the working directory they were started in.
+        return self._pool().submit(_prepare_page, str(src.resolve()), str(dest_dir.resolve()))
+
+    def render(self, title: str, chapters: List[str], images: List[Path], dest: Path,
+               prepared: bool = False) -> Path:
+        """
+        Build the book PDF in a worker process and return `dest` once it is
+        published. With `prepared`, the images come from prepare() and are
+        only placed on the canvas.
+        """
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with self._slots:
+            future = self._pool().submit(_render_pdf, title, list(chapters),
+                                         [str(Path(p).resolve()) for p in images], str(dest.resolve()),
+                                         prepared)
+            future.result()
+        return dest
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pdf_pool = PdfRenderPool()
@@ -0,0 +1,209 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from workflow.user_input import UserConfig, PAINTINGS
+from workflow.art_features import get_art_features
+from workflow.story import create_outline, write_full_story
+from workflow.images import prompts_for_chapters, render_images
+from workflow.layout import StreamingKidsPdf
+from workflow.references import generate_reference_images
+from workflow.metrics import STAGE_SECONDS, STAGES_IN_FLIGHT
+
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "4"))
+# "streaming" draws pages in this process as images land; "process" prepares
+# them in worker processes as they land and assembles the PDF there at the end.
+# This is the default for the CLI and batch runs; API jobs always use "process".
+PDF_RENDER_MODE = os.getenv("PDF_RENDER_MODE", "streaming")
+
+# on_event(stage_name, status, info) with status in {"started", "finished"}
+EventCallback = Callable[[str, str, Dict[str, Any]], None]
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline cannot make progress (missing inputs or a cycle)."""
+
+
+@dataclass
+class Stage:
+    """
+    One unit of work. `fn` is called with the declared inputs as keyword arguments;
+    its return value is stored under the single output, or unpacked across several.
+    """
+    name: str
+    fn: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
+
+def _run_stage(stage: Stage, kwargs: Dict[str, Any]) -> Any:
+    STAGES_IN_FLIGHT.inc(stage=stage.name)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = stage.fn(**kwargs)
+        outcome = "ok"
+        return result
+    finally:
+        STAGES_IN_FLIGHT.dec(stage=stage.name)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage.name, outcome=outcome)
+
+
+class Pipeline:
+    """Runs stages as soon as their inputs exist, independent ones concurrently."""
+
+    def __init__(self, stages: List[Stage]):
+        names = [s.name for s in stages]
+        if len(set(names)) != len(names):
+            raise PipelineError(f"Duplicate stage names in {names}")
+        self.stages = stages
+
+    def run(self, context: Dict[str, Any], max_workers: int = PIPELINE_CONCURRENCY,
+            on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
+        ctx = dict(context)
+        pending = {s.name: s for s in self.stages}
+        running = {}
+        finished = 0
+
+        def emit(stage: Stage, status: str, **info):
+            if on_event:
+                on_event(stage.name, status, {"finished": finished, "total": len(self.stages), **info})
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as pool:
+            try:
+                while pending or running:
+                    for stage in [s for s in pending.values() if all(i in ctx for i in s.inputs)]:
+                        del pending[stage.name]
+                        emit(stage, "started")
+                        kwargs = {i: ctx[i] for i in stage.inputs}
+                        running[pool.submit(_run_stage, stage, kwargs)] = (stage, time.perf_counter())
+
+                    if not running:
+                        missing = {s.name: [i for i in s.inputs if i not in ctx] for s in pending.values()}
+                        raise PipelineError(f"Stages can never run, missing inputs: {missing}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, started = running.pop(future)
+                        result = future.result()
+                        if len(stage.outputs) == 1:
+                            ctx[stage.outputs[0]] = result
+                        elif stage.outputs:
+                            ctx.update(zip(stage.outputs, result))
+                        finished += 1
+                        emit(stage, "finished", seconds=time.perf_counter() - started)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+
+        return ctx
+
+# -------------------- Book pipeline --------------------
+
+def _outline(cfg: UserConfig):
+    outline = create_outline(cfg.child_name, cfg.child_age, cfg.family_value, PAINTINGS[cfg.painting_id])
+    return outline, outline.get("book_title", f"{cfg.child_name}'s Amazing Story")
+
+
+def _text_pages(book: StreamingKidsPdf, chapters: List[str]) -> bool:
+    book.set_chapters(chapters)
+    return True
+
+
+def _images(prompts: List[str], refs, images_dir: Path, book: StreamingKidsPdf,
+            on_page: Optional[Callable[[int, Path], None]]) -> List[Path]:
+    def page_ready(index: int, path: Path):
+        book.add_image(index, path)
+        if on_page:
+            on_page(index, path)
+
+    return render_images(prompts, images_dir, refs=refs, on_page=page_ready)
+
+
+def _check_images(chapters: List[str], images: List[Path]):
+    if not images or len(images) < len(chapters) + 2:  # Need cover, chapters, back
+        raise ValueError("Image generation failed to produce enough images for the book.")
+
+
+def _pdf(book: StreamingKidsPdf, chapters: List[str], images: List[Path], text_pages: bool) -> Path:
+    _check_images(chapters, images)
+    return book.finish()
+
+
+def _pooled_images(prompts: List[str], refs, images_dir: Path,
+                   on_page: Optional[Callable[[int, Path], None]]) -> Tuple[List[Path], Dict[int, Any]]:
+    from workflow.pdf_pool import pdf_pool
+
+    prepared = {}  # index -> Future of the page prepared for the PDF, started as the image lands
+
+    def page_ready(index: int, path: Path):
+        prepared[index] = pdf_pool.prepare(path, images_dir / "prepared")
+        if on_page:
+            on_page(index, path)
+
+    return render_images(prompts, images_dir, refs=refs, on_page=page_ready), prepared
+
+
+def _pooled_pdf(title: str, chapters: List[str], images: List[Path], prepared: Dict[int, Any],
+                images_dir: Path, pdf_path: Path) -> Path:
+    from workflow.pdf_pool import pdf_pool
+
+    _check_images(chapters, images)
+    pages = [Path((prepared.get(i) or pdf_pool.prepare(path, images_dir / "prepared")).result())
+             for i, path in enumerate(images)]
+    return pdf_pool.render(title, chapters, pages, pdf_path, prepared=True)
+
+
+BOOK_STAGES = [
+    Stage("art_features", lambda cfg: get_art_features(cfg.painting_id), ("cfg",), ("art",)),
+    Stage("outline", _outline, ("cfg",), ("outline", "title")),
+    Stage("story", lambda cfg, outline, art: write_full_story(outline, cfg.child_age, art),
+          ("cfg", "outline", "art"), ("chapters",)),
+    Stage("references", lambda cfg, art, refs_dir: generate_reference_images(cfg.child_name, art, refs_dir),
+          ("cfg", "art", "refs_dir"), ("refs",)),
+    Stage("prompts", lambda cfg, art, outline: prompts_for_chapters(cfg.child_name, art, outline),
+          ("cfg", "art", "outline"), ("prompts",)),
+    # The PDF is assembled incrementally: pages are drawn as their images land.
+    Stage("layout", lambda title, prompts, pdf_path: StreamingKidsPdf(title, len(prompts), pdf_path),
+          ("title", "prompts", "pdf_path"), ("book",)),
+    Stage("text_pages", _text_pages, ("book", "chapters"), ("text_pages",)),
+    Stage("images", _images, ("prompts", "refs", "images_dir", "book", "on_page"), ("images",)),
+    Stage("pdf", _pdf, ("book", "chapters", "images", "text_pages")),
+]
+
+# Same DAG, but the PDF work runs in workflow.pdf_pool's processes: each page
+# is resampled and re-encoded there as its image lands, and only the canvas
+# assembly is left for the end.
+POOL_BOOK_STAGES = [s for s in BOOK_STAGES if s.name not in ("layout", "text_pages", "images", "pdf")] + [
+    Stage("images", _pooled_images, ("prompts", "refs", "images_dir", "on_page"), ("images", "prepared")),
+    Stage("pdf", _pooled_pdf, ("title", "chapters", "images", "prepared", "images_dir", "pdf_path")),
+]
+
+
+def run_book(cfg: UserConfig, refs_dir: Path, images_dir: Path, pdf_path: Path,
+             on_event: Optional[EventCallback] = None,
+             on_page: Optional[Callable[[int, Path], None]] = None,
+             mode: str = PDF_RENDER_MODE) -> Dict[str, Any]:
+    """
+    Run the whole book DAG. Art features and the outline start together;
+    story, references and prompts overlap once they are ready, and the PDF
+    is written page by page while the illustrations are still rendering.
+    `on_page(index, path)` is called as each illustration lands (0-based).
+    With mode="process" the pages are prepared in worker processes as they
+    land and the PDF is assembled there after the last one, keeping Pillow
+    and reportlab off this process's GIL.
+    Returns the final context (outline, title, chapters, images, pdf_path, ...).
+    """
+    context = {"cfg": cfg, "refs_dir": refs_dir, "images_dir": images_dir, "pdf_path": pdf_path,
+               "on_page": on_page}
+    if mode == "streaming":
+        stages = BOOK_STAGES
+    elif mode == "process":
+        stages = POOL_BOOK_STAGES
+    else:
+        raise ValueError(f"Unknown PDF render mode: {mode}")
+    return Pipeline(stages).run(context, on_event=on_event)
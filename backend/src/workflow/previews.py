@@ -0,0 +1,64 @@
+import io
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+from PIL import Image
+from workflow.cache import atomic_write_bytes
+
+# Longest side in pixels for each preview size: a grid thumbnail and an on-screen page.
+PREVIEW_SIZES = {
+    "thumb": int(os.getenv("PREVIEW_THUMB_SIZE", "256")),
+    "medium": int(os.getenv("PREVIEW_MEDIUM_SIZE", "1024")),
+}
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "75"))
+
+_PREVIEW_NAME = re.compile(r"page_(\d+)_(\w+)\.webp")
+
+
+def preview_path(previews_dir: Path, index: int, size: str) -> Path:
+    return previews_dir / f"page_{index:02d}_{size}.webp"
+
+
+def make_previews(src: Path, previews_dir: Path, index: int, quality: int = PREVIEW_QUALITY) -> Dict[str, Path]:
+    """
+    WebP previews of one page image at every PREVIEW_SIZES size, largest
+    first from a single decode. Each file is written atomically.
+    """
+    written = {}
+    with Image.open(src) as img:
+        largest = max(PREVIEW_SIZES.values())
+        img.draft("RGB", (largest, largest))  # cheap JPEG downscale on decode
+        img = img.convert("RGB")
+        for size, side in sorted(PREVIEW_SIZES.items(), key=lambda kv: -kv[1]):
+            img.thumbnail((side, side), Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, format="WEBP", quality=quality, method=4)
+            written[size] = preview_path(previews_dir, index, size)
+            atomic_write_bytes(written[size], buf.getvalue())
+    return written
+
+
+def page_manifest(previews_dir: Path) -> List[Dict[str, Any]]:
+    """
+    Pages with previews on disk, in order: one entry per page mapping each
+    size to its pixel dimensions and byte count. Only image headers are read.
+    """
+    pages: Dict[int, Dict[str, Any]] = {}
+    if not previews_dir.is_dir():
+        return []
+    for path in previews_dir.iterdir():
+        match = _PREVIEW_NAME.fullmatch(path.name)
+        if not match or match.group(2) not in PREVIEW_SIZES:
+            continue
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+            nbytes = path.stat().st_size
+        except OSError:
+            continue  # being replaced right now
+        index = int(match.group(1))
+        pages.setdefault(index, {"index": index})[match.group(2)] = {
+            "width": width, "height": height, "bytes": nbytes,
+        }
+    return [pages[i] for i in sorted(pages)]
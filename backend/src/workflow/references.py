@@ -1,29 +1,24 @@
+import os
+import shutil
 from pathlib import Path
 from typing import Dict
 from PIL import Image
-from ai_clients import generate_image_from_text
+from ai_clients import generate_image_from_text, IMAGE_MODEL
+from workflow.cache import content_key, evict_lru
+from workflow.metrics import FALLBACKS
 from rich.console import Console
 
 console = Console()
 
-def generate_reference_images(
-    child_name: str,
-    art,
-    out_dir: Path
-) -> Dict[str, Path]:
-    """
-    Generate separate reference images for hero, props, and environment.
-    Returns dict mapping reference type to file path.
-    """
-    out_dir.mkdir(parents=True, exist_ok=True)
+# Shared across every book: assets are keyed by their prompt, not by the child.
+REFERENCE_CACHE_DIR = Path(os.getenv("REFERENCE_CACHE_DIR", "output/cache/references"))
+REFERENCE_CACHE_MAX_BYTES = int(os.getenv("REFERENCE_CACHE_MAX_MB", "512")) * 1024 * 1024
+REFERENCE_CACHE_MAX_AGE = float(os.getenv("REFERENCE_CACHE_MAX_AGE", str(30 * 24 * 3600)))
 
-    refs = {
-        "hero": out_dir / "hero.png",
-        "props": out_dir / "props.png",
-        "environment": out_dir / "environment.png",
-    }
 
-    prompts = {
+def reference_prompts(child_name: str, art) -> Dict[str, str]:
+    """Prompts for the hero, props and environment references. Only the hero depends on the child."""
+    return {
         "hero": (
             f"Children's book illustration of '{child_name}' as the main character. "
             f"Full body, clear and central. Consistent art style: {art.style}, mood: {art.mood}, "
@@ -42,12 +37,74 @@ def generate_reference_images(
         ),
     }
 
-    for key, path in refs.items():
-        if not path.exists():
+
+# References that do not depend on the child and can be shared by every book of a painting.
+SHARED_REFERENCE_KEYS = ("props", "environment")
+
+
+def reference_cache_path(key: str, prompt: str, cache_dir: Path = REFERENCE_CACHE_DIR) -> Path:
+    return cache_dir / f"{key}_{content_key(IMAGE_MODEL, prompt)[:32]}.png"
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def generate_reference_images(
+    child_name: str,
+    art,
+    out_dir: Path,
+    cache_dir: Path = REFERENCE_CACHE_DIR,
+) -> Dict[str, Path]:
+    """
+    Generate separate reference images for hero, props, and environment.
+    Images come from a content-keyed cache and are linked into `out_dir`;
+    only cache misses are generated.
+    Returns dict mapping reference type to file path.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    refs = {}
+    generated = False
+    for key, prompt in reference_prompts(child_name, art).items():
+        path = out_dir / f"{key}.png"
+        cached = reference_cache_path(key, prompt, cache_dir)
+
+        if cached.exists():
+            os.utime(cached)
+        else:
             console.print(f"🖌️ Generating reference image: {key}…")
-            result_path = generate_image_from_text(prompts[key], path)
-            if not result_path:
-                console.print(f"⚠️ Failed to generate {key}, creating placeholder.")
-                Image.new("RGBA", (1024, 1024), (240, 240, 240, 255)).save(path)
+            generated = generate_image_from_text(prompt, cached) is not None or generated
+
+        try:
+            _link_or_copy(cached, path)
+        except FileNotFoundError:
+            # Placeholders stay in the book's folder so they never poison the cache.
+            console.print(f"⚠️ Failed to generate {key}, creating placeholder.")
+            FALLBACKS.inc(kind="reference_placeholder")
+            Image.new("RGBA", (1024, 1024), (240, 240, 240, 255)).save(path)
+        refs[key] = path
+
+    if generated:
+        evict_lru(cache_dir, max_bytes=REFERENCE_CACHE_MAX_BYTES, max_age=REFERENCE_CACHE_MAX_AGE)
 
     return refs
+
+
+def warm_shared_references(art, cache_dir: Path = REFERENCE_CACHE_DIR) -> Dict[str, bool]:
+    """Generate the child-independent references into the cache; returns which ones are cached."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    prompts = reference_prompts("", art)
+    warmed = {}
+    for key in SHARED_REFERENCE_KEYS:
+        cached = reference_cache_path(key, prompts[key], cache_dir)
+        if not cached.exists():
+            console.print(f"🖌️ Generating shared reference image: {key}…")
+            generate_image_from_text(prompts[key], cached)
+        warmed[key] = cached.exists()
+    return warmed
@@ -1,6 +1,7 @@
 from typing import Dict, List, Any, Optional
 from ai_clients import generate_json, generate_text
 from workflow.art_features import ArtFeatures
+from workflow.metrics import FALLBACKS
 from rich.console import Console
 
 console = Console()
@@ -24,6 +25,7 @@ def create_outline(child_name: str, age: int, value: str, painting: str) -> Dict
     data = generate_json(sys_prompt, user_prompt)
     if not data:
         # --- Fallback outline ---
+        FALLBACKS.inc(kind="outline")
         data = {
             "hero": {"name": child_name, "traits": ["curious", "kind"]},
             "chapters": [
@@ -90,6 +92,7 @@ def write_full_story(outline: Dict, age: int, art_features: ArtFeatures) -> List
     data: Optional[Dict[str, Any]] = generate_json(sys_prompt, user_prompt)
     if not data:
         console.print("[yellow]⚠️ Story generation failed, using fallback text.[/yellow]")
+        FALLBACKS.inc(kind="story")
         return [f"{ch['title']}: {ch['summary']}" for ch in chapters]
 
     # --- Extract chapter texts safely ---
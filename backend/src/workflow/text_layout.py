@@ -0,0 +1,95 @@
+import os
+import functools
+from typing import List, Tuple
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# "optimal" balances the slack across all lines of a paragraph (fewer rivers
+# once justified); "greedy" fills each line as far as it goes.
+TEXT_LAYOUT_MODE = os.getenv("TEXT_LAYOUT_MODE", "optimal")
+
+
+@functools.lru_cache(maxsize=4096)
+def glyph_width(char: str, font_name: str, font_size: float) -> float:
+    return stringWidth(char, font_name, font_size)
+
+
+@functools.lru_cache(maxsize=65536)
+def word_width(word: str, font_name: str, font_size: float) -> float:
+    """Width of a word in points, built from memoized glyph widths."""
+    return sum(glyph_width(ch, font_name, font_size) for ch in word)
+
+
+def text_width(text: str, font_name: str, font_size: float) -> float:
+    """Width of a single-spaced run of words (e.g. one laid-out line)."""
+    words = text.split(" ")
+    space = glyph_width(" ", font_name, font_size)
+    return sum(word_width(w, font_name, font_size) for w in words) + space * (len(words) - 1)
+
+
+def _greedy_breaks(widths: List[float], space: float, max_width: float) -> List[int]:
+    breaks, line_width = [], None
+    for i, w in enumerate(widths):
+        if line_width is not None and line_width + space + w <= max_width:
+            line_width += space + w
+        else:
+            if line_width is not None:
+                breaks.append(i)
+            line_width = w
+    return breaks + [len(widths)]
+
+
+def _optimal_breaks(widths: List[float], space: float, max_width: float) -> List[int]:
+    """
+    Minimum-raggedness line breaking: minimise the sum of squared slack over
+    every line but the last. A single word wider than the line gets a line of
+    its own. O(words x words-per-line).
+    """
+    n = len(widths)
+    prefix = [0.0]
+    for w in widths:
+        prefix.append(prefix[-1] + w)
+
+    best = [0.0] + [float("inf")] * n  # best[j]: cost of laying out words[:j]
+    start_of = [0] * (n + 1)
+    for j in range(1, n + 1):
+        for i in range(j - 1, -1, -1):
+            line = prefix[j] - prefix[i] + space * (j - i - 1)
+            if line > max_width and i < j - 1:
+                break
+            slack = max(0.0, max_width - line)
+            cost = best[i] + (0.0 if j == n else slack * slack)
+            if cost < best[j]:
+                best[j], start_of[j] = cost, i
+
+    breaks, j = [], n
+    while j > 0:
+        breaks.append(j)
+        j = start_of[j]
+    return breaks[::-1]
+
+
+@functools.lru_cache(maxsize=512)
+def _layout(text: str, max_width: float, font_name: str, font_size: float, mode: str) -> Tuple[str, ...]:
+    words = text.split()
+    if not words:
+        return ()
+    widths = [word_width(w, font_name, font_size) for w in words]
+    space = glyph_width(" ", font_name, font_size)
+    if mode == "optimal":
+        breaks = _optimal_breaks(widths, space, max_width)
+    elif mode == "greedy":
+        breaks = _greedy_breaks(widths, space, max_width)
+    else:
+        raise ValueError(f"Unknown text layout mode: {mode}")
+
+    lines, start = [], 0
+    for end in breaks:
+        lines.append(" ".join(words[start:end]))
+        start = end
+    return tuple(lines)
+
+
+def break_lines(text: str, max_width: float, font_name: str, font_size: float,
+                mode: str = TEXT_LAYOUT_MODE) -> List[str]:
+    """Wrap `text` into lines no wider than `max_width` points. Results are memoized."""
+    return list(_layout(text, max_width, font_name, font_size, mode))
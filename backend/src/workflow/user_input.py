@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from workflow.cache import content_key
 
 PAINTINGS = {
     "starry_night": "Vincent van Gogh's Starry Night",
@@ -28,6 +29,12 @@ def normalize_user_config(cfg: UserConfig) -> UserConfig:
     return cfg
 
 
+def request_key(cfg: UserConfig) -> str:
+    """Stable hash of the normalized request; identical books share a key."""
+    cfg = normalize_user_config(replace(cfg))
+    return content_key(cfg.painting_id, cfg.child_name, cfg.child_age, cfg.family_value)
+
+
 def validate_user_config(cfg: UserConfig) -> None:
     if cfg.painting_id not in PAINTINGS:
         raise ValidationError(
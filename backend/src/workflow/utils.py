@@ -1,4 +1,4 @@
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_exponential, wait_random_exponential, retry_if_exception_type
 
 class RecoverableError(Exception):
     pass
@@ -9,3 +9,13 @@ retry_api = retry(
     wait=wait_exponential(multiplier=1, min=1, max=8),
     retry=retry_if_exception_type(RecoverableError)
 )
+
+
+def retry_policy(attempts: int = 3, max_wait: float = 8.0):
+    """Like `retry_api`, with configurable attempts and full-jitter exponential backoff."""
+    return retry(
+        reraise=True,
+        stop=stop_after_attempt(max(1, attempts)),
+        wait=wait_random_exponential(multiplier=1, max=max_wait),
+        retry=retry_if_exception_type(RecoverableError)
+    )
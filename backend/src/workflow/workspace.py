@@ -0,0 +1,190 @@
+import os
+import re
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+from workflow.metrics import GC_REMOVED_BYTES
+
+OUTPUT_MAX_AGE = float(os.getenv("OUTPUT_MAX_AGE", str(7 * 24 * 3600)))
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_MB", "4096")) * 1024 * 1024
+OUTPUT_GC_INTERVAL = float(os.getenv("OUTPUT_GC_INTERVAL", "600"))
+
+# Books the API publishes next to the workspaces: book_<name>_<job id>.pdf (see
+# web.services and web.jobs). Everything else under output/ (the CLI's books,
+# images and references, caches, the memory store) is never collected.
+PUBLISHED_BOOK = re.compile(r"book_[^/]+_[0-9a-f]{12}\.pdf")
+# Written into a workspace while a process outside the API (e.g. a batch run) uses it.
+HOLD_MARKER = ".in-use"
+
+
+@dataclass(frozen=True)
+class Workspace:
+    """Scratch directory owned by one job: output/jobs/<job_id>/."""
+    root: Path
+
+    @classmethod
+    def create(cls, output_dir: Path, job_id: str) -> "Workspace":
+        ws = cls(output_dir / "jobs" / job_id)
+        ws.root.mkdir(parents=True, exist_ok=True)
+        return ws
+
+    @property
+    def refs_dir(self) -> Path:
+        return self.root / "references"
+
+    @property
+    def images_dir(self) -> Path:
+        return self.root / "images"
+
+    @property
+    def previews_dir(self) -> Path:
+        return self.root / "previews"
+
+    @property
+    def pdf_path(self) -> Path:
+        return self.root / "book.pdf"
+
+    @contextmanager
+    def hold(self):
+        """Keep the collector away from this workspace, in any process, while in use."""
+        marker = self.root / HOLD_MARKER
+        marker.write_text(str(os.getpid()))
+        try:
+            yield self
+        finally:
+            marker.unlink(missing_ok=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _held(workspace_dir: Path) -> bool:
+    """True while the process that wrote the hold marker is still running."""
+    try:
+        return _alive(int((workspace_dir / HOLD_MARKER).read_text()))
+    except (OSError, ValueError):
+        return False
+
+
+def publish(src: Path, dest: Path) -> Path:
+    """
+    Atomically move a finished file into place. Readers see either no file or
+    the complete one; a staged copy is used if `src` is on another filesystem.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dest)
+    except OSError:
+        staged = dest.with_name(f".{dest.name}.publish")
+        shutil.copy2(src, staged)
+        os.replace(staged, dest)
+        src.unlink(missing_ok=True)
+    return dest
+
+
+def _usage(path: Path):
+    """(newest mtime, total bytes) of a file or directory tree."""
+    st = path.stat()
+    if not path.is_dir():
+        return st.st_mtime, st.st_size
+    newest, total = st.st_mtime, 0
+    for child in path.rglob("*"):
+        try:
+            cst = child.stat()
+        except FileNotFoundError:
+            continue
+        newest = max(newest, cst.st_mtime)
+        if child.is_file():
+            total += cst.st_size
+    return newest, total
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def collect_garbage(output_dir: Path, max_age: Optional[float] = OUTPUT_MAX_AGE,
+                    max_bytes: Optional[int] = OUTPUT_MAX_BYTES,
+                    active: Iterable[str] = ()) -> Dict[str, int]:
+    """
+    Delete job workspaces (output/jobs/<id>) and books the API published
+    (PUBLISHED_BOOK): first anything older than `max_age`, then the oldest
+    until their total is at most `max_bytes`. Workspaces of `active` job IDs
+    and held workspaces are kept.
+    """
+    if not output_dir.exists():
+        return {"removed": 0, "bytes": 0}
+
+    active = set(active)
+    units = [p for p in output_dir.iterdir() if p.is_file() and PUBLISHED_BOOK.fullmatch(p.name)]
+    jobs_dir = output_dir / "jobs"
+    if jobs_dir.is_dir():
+        units += [p for p in jobs_dir.iterdir() if p.name not in active and not _held(p)]
+
+    now = time.time()
+    entries = []
+    removed = freed = 0
+    for path in units:
+        try:
+            mtime, size = _usage(path)
+        except FileNotFoundError:
+            continue
+        if max_age is not None and now - mtime > max_age:
+            _remove(path)
+            removed += 1
+            freed += size
+        else:
+            entries.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if max_bytes is not None and total > max_bytes:
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            _remove(path)
+            removed += 1
+            freed += size
+            total -= size
+            if total <= max_bytes:
+                break
+
+    GC_REMOVED_BYTES.inc(freed)
+    return {"removed": removed, "bytes": total}
+
+
+class GarbageCollector:
+    """Runs collect_garbage every `interval` seconds on a daemon thread."""
+
+    def __init__(self, output_dir: Path, active: Callable[[], Iterable[str]] = tuple,
+                 interval: float = OUTPUT_GC_INTERVAL, **limits):
+        self.output_dir = output_dir
+        self.active = active
+        self.interval = interval
+        self.limits = limits
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="output-gc", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                collect_garbage(self.output_dir, active=self.active(), **self.limits)
+            except Exception as e:
+                print(f"⚠️ Output garbage collection failed: {e}")